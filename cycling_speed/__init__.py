@@ -0,0 +1,4 @@
+"""Model serving helpers for the Cycling Speed Predictor app."""
+from cycling_speed.inference import SpeedPredictor, categorize, heuristic_speed
+
+__all__ = ['SpeedPredictor', 'categorize', 'heuristic_speed']
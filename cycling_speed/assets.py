@@ -0,0 +1,119 @@
+"""Resized, re-encoded image assets for the app pages.
+
+The gallery photos and the profile picture are 1–4k pixel JPEGs of up to
+1.3 MB, sent at full size on every rerun although they are shown at most
+~1000 px wide (the profile at 180 px). image_bytes() returns a variant
+resized to the display width and encoded as WebP. It is generated once
+into ASSET_CACHE_DIR and kept in memory keyed by the source path and
+mtime, so a rerun costs one os.stat and an edited photo gets a new
+variant.
+
+    python -m cycling_speed.assets        # build the variants and compare sizes
+"""
+import argparse
+import base64
+import functools
+import hashlib
+import os
+import time
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets')
+ASSET_CACHE_DIR = os.environ.get("ASSET_CACHE_DIR", "./.asset_cache")
+
+GALLERY_IMAGES = ['home1.jpg', 'home2.jpg', 'home3.jpg']
+PROFILE_IMAGE = 'profile.jpg'
+# Display sizes (px) at 2x for high-DPI screens
+GALLERY_WIDTH = 1000
+PROFILE_SIZE = 360
+
+FORMATS = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+
+def asset_path(name):
+    """Path of a file in the app's assets directory, independent of the working directory."""
+    return os.path.join(ASSETS_DIR, name)
+
+
+def _variant_path(path, mtime_ns, width, fmt, square, cache_dir):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    key = hashlib.sha1(f"{os.path.abspath(path)}:{mtime_ns}".encode()).hexdigest()[:12]
+    return os.path.join(cache_dir, f"{stem}-{width}{'sq' if square else 'w'}-{key}.{fmt}")
+
+
+def _render(path, width, fmt, square, quality):
+    from io import BytesIO
+
+    from PIL import Image, ImageOps
+
+    with Image.open(path) as image:
+        # Phone photos store their orientation in EXIF
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        if square:
+            image = ImageOps.fit(image, (width, width), Image.LANCZOS)
+        elif image.width > width:
+            image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+        buffer = BytesIO()
+        image.save(buffer, format=fmt.upper(), quality=quality, method=4 if fmt == 'webp' else 0)
+    return buffer.getvalue()
+
+
+@functools.lru_cache(maxsize=64)
+def _variant(path, mtime_ns, width, fmt, square, quality, cache_dir):
+    variant = _variant_path(path, mtime_ns, width, fmt, square, cache_dir)
+    try:
+        with open(variant, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+    data = _render(path, width, fmt, square, quality)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(variant + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(variant + '.tmp', variant)
+    except OSError:
+        pass  # read-only deploys still get the in-memory copy
+    return data
+
+
+def image_bytes(path, width, fmt='webp', square=False, quality=80, cache_dir=ASSET_CACHE_DIR):
+    """Encoded bytes of ``path`` at most ``width`` px wide (``square`` crops to width x width)."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported image format {fmt!r}; use one of {tuple(FORMATS)}")
+    return _variant(path, os.stat(path).st_mtime_ns, width, fmt, square, quality, cache_dir)
+
+
+@functools.lru_cache(maxsize=16)
+def _data_uri(path, mtime_ns, width, fmt, square, quality, cache_dir):
+    data = _variant(path, mtime_ns, width, fmt, square, quality, cache_dir)
+    return f"data:{FORMATS[fmt]};base64,{base64.b64encode(data).decode()}"
+
+
+def image_data_uri(path, width, fmt='webp', square=False, quality=80, cache_dir=ASSET_CACHE_DIR):
+    """``data:`` URI of the resized variant, for inline HTML/CSS."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported image format {fmt!r}; use one of {tuple(FORMATS)}")
+    return _data_uri(path, os.stat(path).st_mtime_ns, width, fmt, square, quality, cache_dir)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the resized image variants and compare sizes.")
+    parser.add_argument('--cache-dir', default=ASSET_CACHE_DIR)
+    args = parser.parse_args(argv)
+
+    images = [(name, GALLERY_WIDTH, False) for name in GALLERY_IMAGES] + [(PROFILE_IMAGE, PROFILE_SIZE, True)]
+    print(f"{'image':<12} {'original':>10} {'variant':>9} {'build':>8} {'cached':>8}")
+    for name, width, square in images:
+        path = asset_path(name)
+        start = time.perf_counter()
+        data = image_bytes(path, width, square=square, cache_dir=args.cache_dir)
+        built = time.perf_counter() - start
+        start = time.perf_counter()
+        image_bytes(path, width, square=square, cache_dir=args.cache_dir)
+        cached = time.perf_counter() - start
+        print(f"{name:<12} {os.path.getsize(path) / 1024:>8.0f}KB {len(data) / 1024:>7.0f}KB "
+              f"{built * 1000:>6.0f}ms {cached * 1e6:>6.0f}us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Headless batch scoring of ride files (CSV, Parquet or Excel).
+
+Rows are streamed in chunks, scored with one booster call per chunk and
+appended to the output file, so memory stays bounded by the chunk size.
+CSV and Excel inputs are read through the typed Parquet cache (see
+dataset.py), so rescoring an unchanged export skips the text parsing.
+
+The weekday comes from the Tanggal column; files without one need
+--date or --day-of-week, rather than silently being scored as today.
+
+    python -m cycling_speed.batch rides.csv predictions.csv --chunksize 200000
+    python -m cycling_speed.batch planned.csv predictions.csv --date 2025-08-02
+"""
+import argparse
+import datetime
+import time
+
+import numpy as np
+
+from cycling_speed.dataset import DATASET_CACHE_DIR, ChunkWriter, cached_dataset, iter_chunks
+from cycling_speed.export import load_package
+from cycling_speed.features import DATE_FORMAT, days_of_week, start_hours
+from cycling_speed.inference import MODEL_PATH, SpeedPredictor
+
+INPUT_COLUMNS = ['Elevasi', 'Jarak', 'Curah_Hujan', 'Jam_Tidur', 'Jam_Mulai']
+OUTPUT_COLUMN = 'Predicted_Speed'
+
+
+def score_frame(predictor, df, date_format=DATE_FORMAT, day_of_week=None):
+    """Return predicted speeds for a DataFrame with the ride input columns.
+
+    The weekday is taken from Tanggal when present, else from ``day_of_week``
+    (0 = Monday); a ValueError is raised when there is neither.
+    """
+    missing = [col for col in INPUT_COLUMNS if col not in df.columns]
+    if missing:
+        raise KeyError(f"Missing input columns: {missing}")
+    if 'Tanggal' in df.columns:
+        day_of_week = days_of_week(df['Tanggal'], date_format)
+    elif day_of_week is None:
+        raise ValueError("No Tanggal column: pass the rides' day_of_week (--date or --day-of-week)")
+    return predictor.predict(
+        df['Elevasi'].to_numpy(dtype=np.float64),
+        df['Jarak'].to_numpy(dtype=np.float64),
+        df['Curah_Hujan'].to_numpy(dtype=np.float64),
+        df['Jam_Tidur'].to_numpy(dtype=np.float64),
+        start_hours(df['Jam_Mulai']),
+        day_of_week,
+    )
+
+
+def score_file(input_path, output_path, model_package=None, model_path=MODEL_PATH, chunksize=100_000,
+               output_column=OUTPUT_COLUMN, date_format=DATE_FORMAT, predictor=None,
+               cache_dir=DATASET_CACHE_DIR, day_of_week=None):
+    """Score every row of ``input_path`` and write it with a prediction column.
+
+    With ``cache_dir=None`` the input is streamed directly instead of through
+    the Parquet cache. ``day_of_week`` is used for inputs without a Tanggal
+    column (see score_frame). Returns a dict with the number of rows scored and
+    elapsed seconds.
+    """
+    if predictor is None:
+        if model_package is None:
+            model_package = load_package(model_path)
+        predictor = SpeedPredictor(model_package)
+
+    start = time.perf_counter()
+    if cache_dir is not None:
+        input_path = cached_dataset(input_path, cache_dir, chunksize, date_format)
+    n_rows = 0
+    writer = ChunkWriter(output_path, date_format)
+    try:
+        for chunk in iter_chunks(input_path, chunksize):
+            chunk[output_column] = score_frame(predictor, chunk, date_format, day_of_week)
+            writer.write(chunk)
+            n_rows += len(chunk)
+    finally:
+        writer.close()
+    return {'rows': n_rows, 'seconds': time.perf_counter() - start}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch-score ride files with the cycling speed model.")
+    parser.add_argument('input', help="input .csv, .parquet or .xlsx file")
+    parser.add_argument('output', help="output .csv or .parquet file")
+    parser.add_argument('--model', default=MODEL_PATH, help="joblib model package or native export")
+    parser.add_argument('--chunksize', type=int, default=100_000, help="rows per chunk")
+    parser.add_argument('--output-column', default=OUTPUT_COLUMN)
+    parser.add_argument('--date-format', default=DATE_FORMAT, help="format of string Tanggal values")
+    parser.add_argument('--cache-dir', default=DATASET_CACHE_DIR, help="typed Parquet cache for CSV/Excel inputs")
+    parser.add_argument('--no-cache', action='store_true', help="stream the input without the Parquet cache")
+    day = parser.add_mutually_exclusive_group()
+    day.add_argument('--date', type=datetime.date.fromisoformat, default=None,
+                     help="ride date (YYYY-MM-DD) for inputs without a Tanggal column")
+    day.add_argument('--day-of-week', type=int, choices=range(7), default=None,
+                     help="weekday (0 = Monday) for inputs without a Tanggal column")
+    args = parser.parse_args(argv)
+    day_of_week = args.date.weekday() if args.date else args.day_of_week
+
+    try:
+        stats = score_file(args.input, args.output, model_path=args.model, chunksize=args.chunksize,
+                           output_column=args.output_column, date_format=args.date_format,
+                           cache_dir=None if args.no_cache else args.cache_dir, day_of_week=day_of_week)
+    except ValueError as e:
+        parser.exit(1, f"{e}\n")
+    rate = stats['rows'] / stats['seconds'] * 60 if stats['seconds'] else float('inf')
+    print(f"Scored {stats['rows']} rows in {stats['seconds']:.2f}s ({rate:,.0f} rows/min) -> {args.output}")
+
+
+if __name__ == '__main__':
+    main()
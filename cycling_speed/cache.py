@@ -0,0 +1,103 @@
+"""In-process LRU/TTL cache for prediction results."""
+import datetime
+import threading
+import time
+from collections import OrderedDict
+
+from cycling_speed.inference import has_model
+
+
+def model_version(model_package):
+    """Identify a model package for cache keys (its training timestamp, or 'demo')."""
+    if not has_model(model_package):
+        return 'demo'
+    return str(model_package.get('training_info', {}).get('training_date', 'unknown'))
+
+
+def prediction_key(elevasi, jarak, curah_hujan, jam_tidur, jam_mulai, version, tanggal=None):
+    """Normalize form inputs into a hashable cache key.
+
+    Values are snapped to the form's slider steps (jarak 0.5, elevasi 10,
+    curah_hujan 0.1, jam_tidur 1). Only the start hour and the weekday reach
+    the model, so the start minute is dropped and the weekday is included.
+    """
+    if tanggal is None:
+        tanggal = datetime.date.today()
+    hour = jam_mulai if isinstance(jam_mulai, int) else jam_mulai.hour
+    return (
+        version,
+        int(round(elevasi / 10)) * 10,
+        round(jarak * 2) / 2,
+        round(curah_hujan, 1),
+        int(round(jam_tidur)),
+        hour,
+        tanggal.weekday(),
+    )
+
+
+class PredictionCache:
+    """Thread-safe LRU cache with an optional time-to-live per entry.
+
+    ``maxsize`` bounds the number of entries; ``ttl`` is in seconds (None
+    keeps entries until evicted). Values must not be None.
+    """
+
+    def __init__(self, maxsize=4096, ttl=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached value for ``key`` or None on a miss."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > self._clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        expires = None if self.ttl is None else self._clock() + self.ttl
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value, computing and storing it on a miss."""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
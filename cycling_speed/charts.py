@@ -0,0 +1,185 @@
+"""Plotly figures for the prediction page, built once and patched per request.
+
+Constructing a go.Figure validates every property, including the ~3 KB
+theme template Plotly attaches to each figure, and st.plotly_chart sends
+all of it over the websocket on every rerun. FigureTemplate builds and
+validates a figure once, keeps it as a plain dict, and per request copies
+only the traces it patches into a Figure that skips validation.
+
+With ``compact`` (PLOTLY_COMPACT_FIGURES, default on) the template is cut
+down to the colorway placeholders and the trace types the figure uses.
+The browser fills in the rest when the chart is drawn with
+st.plotly_chart's default ``theme='streamlit'``, so only figures shown
+with that theme should be compact.
+
+    python -m cycling_speed.charts        # build time and payload per figure
+"""
+import argparse
+import functools
+import os
+import time
+
+COMPACT_FIGURES = os.environ.get("PLOTLY_COMPACT_FIGURES", "1") != "0"
+
+RADAR_CATEGORIES = ['Distance\n(Normalized)', 'Elevation\n(Normalized)', 'Rain\n(Inverted)', 'Sleep\n(Normalized)']
+SCENARIO_COLORS = {'Perfect Conditions': '#2ecc71', 'Your Prediction': '#e74c3c'}
+DEFAULT_SCENARIO_COLOR = '#95a5a6'
+
+
+def compact_spec(spec):
+    """Copy of a figure dict whose layout.template keeps only what the figure needs."""
+    template = spec['layout'].get('template', {})
+    trace_types = {trace.get('type', 'scatter') for trace in spec['data']}
+    compact = {'layout': {key: value for key, value in template.get('layout', {}).items() if key == 'colorway'}}
+    data = {name: traces for name, traces in template.get('data', {}).items() if name in trace_types}
+    if data:
+        compact['data'] = data
+    return {**spec, 'layout': {**spec['layout'], 'template': compact}}
+
+
+class FigureTemplate:
+    """A figure built by ``build()`` once, re-emitted with patched traces.
+
+    figure() takes one dict per trace (in order) of properties to replace,
+    e.g. ``figure({'r': values})``; traces without a patch are reused.
+    """
+
+    def __init__(self, build, compact=COMPACT_FIGURES):
+        spec = build().to_dict()
+        self.spec = compact_spec(spec) if compact else spec
+
+    def figure(self, *patches):
+        import plotly.graph_objects as go
+
+        data = [dict(trace, **patch) for trace, patch in zip(self.spec['data'], patches)]
+        data += self.spec['data'][len(patches):]
+        # The template was validated in __init__; st.plotly_chart copies the figure before serializing it
+        return go.Figure({'data': data, 'layout': self.spec['layout']}, _validate=False)
+
+
+def _build_radar():
+    import plotly.graph_objects as go
+
+    fig_radar = go.Figure(
+        data=go.Scatterpolar(
+            r=[0] * len(RADAR_CATEGORIES),
+            theta=RADAR_CATEGORIES,
+            fill='toself',
+            line=dict(color='rgb(255, 107, 107)'),
+            fillcolor='rgba(255, 107, 107, 0.3)',
+        )
+    )
+    fig_radar.update_layout(
+        polar=dict(radialaxis=dict(visible=True, range=[0, 1])),
+        showlegend=False,
+        title="Input Parameters Overview",
+        height=300,
+    )
+    return fig_radar
+
+
+def _build_comparison():
+    import plotly.graph_objects as go
+
+    fig_comparison = go.Figure(data=[go.Bar(x=[], y=[], marker_color=[])])
+    fig_comparison.update_layout(
+        title="Speed Comparison Across Different Scenarios",
+        xaxis_title="Scenarios",
+        yaxis_title="Speed (km/h)",
+        height=400,
+    )
+    return fig_comparison
+
+
+@functools.lru_cache(maxsize=None)
+def figure_template(name, compact=COMPACT_FIGURES):
+    """The shared FigureTemplate ``'radar'`` or ``'comparison'``."""
+    builders = {'radar': _build_radar, 'comparison': _build_comparison}
+    return FigureTemplate(builders[name], compact)
+
+
+def radar_figure(jarak, elevasi, curah_hujan, jam_tidur, compact=COMPACT_FIGURES):
+    """Radar chart of the normalized form inputs."""
+    values = [
+        jarak / 50,
+        elevasi / 700,
+        1 - (curah_hujan / 100),
+        jam_tidur / 12,
+    ]
+    return figure_template('radar', compact).figure({'r': values})
+
+
+def comparison_figure(comparison_scenarios, compact=COMPACT_FIGURES):
+    """Bar chart of (name, speed) pairs, highlighting the best case and the rider's prediction."""
+    scenario_names = [item[0] for item in comparison_scenarios]
+    scenario_speeds = [item[1] for item in comparison_scenarios]
+    colors = [SCENARIO_COLORS.get(name, DEFAULT_SCENARIO_COLOR) for name in scenario_names]
+    return figure_template('comparison', compact).figure(
+        {'x': scenario_names, 'y': scenario_speeds, 'marker': {'color': colors}})
+
+
+def _build_full_radar(jarak, elevasi, curah_hujan, jam_tidur):
+    fig_radar = _build_radar()
+    fig_radar.data[0].r = [jarak / 50, elevasi / 700, 1 - (curah_hujan / 100), jam_tidur / 12]
+    return fig_radar
+
+
+def _build_full_comparison(comparison_scenarios):
+    fig_comparison = _build_comparison()
+    names = [item[0] for item in comparison_scenarios]
+    fig_comparison.data[0].update(x=names, y=[item[1] for item in comparison_scenarios],
+                                  marker_color=[SCENARIO_COLORS.get(n, DEFAULT_SCENARIO_COLOR) for n in names])
+    return fig_comparison
+
+
+def benchmark(repeat=200):
+    """Per-figure build-to-JSON time and payload bytes: rebuilt, template-patched and compact."""
+    import plotly.io as pio
+    import plotly.tools
+
+    try:
+        # Registers and selects the 'streamlit' Plotly template, as in the app
+        import streamlit.elements.plotly_chart  # noqa: F401
+    except ImportError:
+        pass
+
+    inputs = {
+        'radar': (25.0, 200, 0.0, 7),
+        'comparison': ([('Perfect Conditions', 24.1), ('Your Prediction', 21.3), ('Rainy Day', 15.2)],),
+    }
+    variants = {
+        'rebuilt': {'radar': _build_full_radar, 'comparison': _build_full_comparison},
+        'template': {'radar': functools.partial(radar_figure, compact=False),
+                     'comparison': functools.partial(comparison_figure, compact=False)},
+        'compact': {'radar': functools.partial(radar_figure, compact=True),
+                    'comparison': functools.partial(comparison_figure, compact=True)},
+    }
+
+    def ship(figure):
+        # What st.plotly_chart does with a Figure
+        return pio.to_json(plotly.tools.return_figure_from_figure_or_data(figure, True), validate=False)
+
+    results = []
+    for variant, builders in variants.items():
+        for name, build in builders.items():
+            payload = ship(build(*inputs[name]))
+            start = time.perf_counter()
+            for _ in range(repeat):
+                ship(build(*inputs[name]))
+            results.append({'figure': name, 'variant': variant, 'ms': (time.perf_counter() - start) / repeat * 1000,
+                            'bytes': len(payload.encode())})
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare rebuilt, template-patched and compact Plotly figures.")
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args(argv)
+
+    print(f"{'figure':<11} {'variant':<9} {'ms/rerun':>9} {'bytes':>7}")
+    for row in benchmark(args.repeat):
+        print(f"{row['figure']:<11} {row['variant']:<9} {row['ms']:>9.3f} {row['bytes']:>7,}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+"""Ride file I/O and the columnar dataset cache.
+
+Excel (openpyxl) and CSV parsing is slow and repeats the Tanggal/Jam_Mulai
+string parsing on every run. cached_dataset() converts a source file once,
+chunk by chunk, into a typed Parquet file: Tanggal as datetime64, Jam_Mulai
+as time since midnight (timedelta64), measurements as float64 and any
+other column as text, whatever a chunk's values look like. A sidecar
+records the source's size, mtime and SHA-256; the cache is rebuilt when the
+content changes (a touched but identical file only refreshes the sidecar).
+Training and batch scoring both read rides through it.
+
+    python -m cycling_speed.dataset Book1.xlsx     # build/refresh the cache
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from cycling_speed.features import DATE_FORMAT, parse_dates, parse_start_times
+
+DATASET_CACHE_DIR = os.environ.get("DATASET_CACHE_DIR", "./.dataset_cache")
+
+# Bump when the cached layout changes, so old caches are rebuilt
+CACHE_VERSION = 2
+
+NUMERIC_COLUMNS = ['Durasi_Menit', 'Elevasi', 'Jarak', 'Kec_Rata_Rata', 'Kec_Maksimal', 'Curah_Hujan', 'Jam_Tidur']
+
+
+def _file_format(path):
+    name = str(path).lower()
+    for suffix in ('.gz', '.bz2', '.zip', '.xz'):
+        if name.endswith(suffix):
+            name = name[: -len(suffix)]
+    ext = os.path.splitext(name)[1]
+    if ext in ('.csv', '.txt'):
+        return 'csv'
+    if ext in ('.parquet', '.pq'):
+        return 'parquet'
+    if ext in ('.xlsx', '.xlsm'):
+        return 'excel'
+    raise ValueError(f"Unsupported file type: {path}")
+
+
+def _iter_excel(path, chunksize):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = list(next(rows))
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == chunksize:
+                yield pd.DataFrame(chunk, columns=header)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header)
+    finally:
+        workbook.close()
+
+
+def iter_chunks(path, chunksize=100_000, dtype=None):
+    """Yield DataFrame chunks of at most ``chunksize`` rows from a ride file.
+
+    ``dtype`` is passed to pd.read_csv for CSV files (``str`` keeps every
+    cell's text as written, instead of inferring types chunk by chunk).
+    """
+    fmt = _file_format(path)
+    if fmt == 'csv':
+        yield from pd.read_csv(path, chunksize=chunksize, dtype=dtype)
+    elif fmt == 'parquet':
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from _iter_excel(path, chunksize)
+
+
+def _format_unique(values, format_one):
+    """Format a column as text, calling ``format_one`` once per distinct non-null value."""
+    codes, uniques = pd.factorize(values)
+    text = [format_one(value) for value in uniques]
+    return pd.Series(np.array(text + [None], dtype=object)[codes], index=values.index)
+
+
+def _format_start_time(value):
+    seconds = int(value.total_seconds())
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class ChunkWriter:
+    """Append DataFrame chunks to a CSV or Parquet file.
+
+    CSV output writes datetime columns with ``date_format`` and timedelta
+    start times as HH:MM:SS, the way ride exports store them.
+    """
+
+    def __init__(self, path, date_format=DATE_FORMAT):
+        self.path = path
+        self.format = _file_format(path)
+        if self.format == 'excel':
+            raise ValueError("Excel output is not supported for streaming; use .csv or .parquet")
+        self.date_format = date_format
+        self._parquet = None
+        self._started = False
+
+    def _csv_columns(self, df):
+        text = {}
+        for col in df.columns:
+            if pd.api.types.is_datetime64_any_dtype(df[col]):
+                text[col] = _format_unique(df[col], lambda value: value.strftime(self.date_format))
+            elif pd.api.types.is_timedelta64_dtype(df[col]):
+                text[col] = _format_unique(df[col], _format_start_time)
+        return df.assign(**text) if text else df
+
+    def write(self, df):
+        if self.format == 'csv':
+            df = self._csv_columns(df)
+            df.to_csv(self.path, mode='a' if self._started else 'w', header=not self._started, index=False)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            if self._parquet is None:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            else:
+                table = pa.Table.from_pandas(df, schema=self._parquet.schema, preserve_index=False)
+            self._parquet.write_table(table)
+        self._started = True
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+
+
+def typed_chunk(df, date_format=DATE_FORMAT):
+    """Give a raw chunk the cache's fixed column types, so every chunk has one schema.
+
+    Columns other than Tanggal, Jam_Mulai and NUMERIC_COLUMNS become
+    strings even when a chunk's values look numeric or are all missing,
+    since another chunk of the same column may hold text.
+    """
+    df = df.copy()
+    if 'Tanggal' in df.columns:
+        df['Tanggal'] = parse_dates(df['Tanggal'], date_format).astype('datetime64[ns]')
+    if 'Jam_Mulai' in df.columns:
+        df['Jam_Mulai'] = parse_start_times(df['Jam_Mulai']).astype('timedelta64[ns]')
+    for col in df.columns:
+        if col in NUMERIC_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+        elif col not in ('Tanggal', 'Jam_Mulai'):
+            df[col] = df[col].astype('string')
+    return df
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_path(source, cache_dir=DATASET_CACHE_DIR):
+    """Parquet cache file for ``source`` (one per absolute source path)."""
+    source = os.path.abspath(source)
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(cache_dir, f"{stem}-{hashlib.sha1(source.encode()).hexdigest()[:12]}.parquet")
+
+
+def _meta_path(path):
+    return path + '.meta.json'
+
+
+def _read_meta(path):
+    try:
+        with open(_meta_path(path), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _temp_path(path, suffix):
+    """A name next to ``path``, unique per writer (process and call), to write before os.replace()."""
+    return f'{path}.{os.getpid()}-{uuid.uuid4().hex[:12]}{suffix}'
+
+
+def _write_meta(path, meta):
+    temp = _temp_path(_meta_path(path), '.tmp')
+    try:
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=1)
+        os.replace(temp, _meta_path(path))
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+
+
+def source_fingerprint(source, cache_dir=DATASET_CACHE_DIR):
+    """SHA-256 of ``source``, reusing the cache sidecar's hash while size and mtime are unchanged."""
+    stat = os.stat(source)
+    meta = _read_meta(cache_path(source, cache_dir))
+    if meta and meta.get('size') == stat.st_size and meta.get('mtime_ns') == stat.st_mtime_ns:
+        return meta['sha256']
+    return file_sha256(source)
+
+
+def cached_dataset(source, cache_dir=DATASET_CACHE_DIR, chunksize=100_000, date_format=DATE_FORMAT):
+    """Path of an up-to-date typed Parquet copy of ``source`` (built if missing or stale).
+
+    Parquet sources are already columnar and are returned unchanged.
+    """
+    if _file_format(source) == 'parquet':
+        return source
+    path = cache_path(source, cache_dir)
+    stat = os.stat(source)
+    meta = _read_meta(path)
+    valid = (meta is not None and os.path.exists(path) and meta.get('version') == CACHE_VERSION
+             and meta.get('date_format') == date_format)
+    if valid and meta.get('size') == stat.st_size and meta.get('mtime_ns') == stat.st_mtime_ns:
+        return path
+
+    sha256 = file_sha256(source)
+    if not (valid and meta.get('sha256') == sha256):
+        os.makedirs(cache_dir, exist_ok=True)
+        # Concurrent builders each write their own file; the last os.replace wins
+        temp = _temp_path(path, '.tmp.parquet')
+        try:
+            writer = ChunkWriter(temp)
+            try:
+                for chunk in iter_chunks(source, chunksize, dtype=str):
+                    writer.write(typed_chunk(chunk, date_format))
+            finally:
+                writer.close()
+            os.replace(temp, path)
+        finally:
+            if os.path.exists(temp):
+                os.remove(temp)
+    _write_meta(path, {
+        'source': os.path.abspath(source), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+        'sha256': sha256, 'date_format': date_format, 'version': CACHE_VERSION,
+    })
+    return path
+
+
+def load_rides(source, cache_dir=DATASET_CACHE_DIR, columns=None, date_format=DATE_FORMAT):
+    """Read a ride file through the columnar cache as a typed DataFrame."""
+    path = cached_dataset(source, cache_dir, date_format=date_format)
+    df = pd.read_parquet(path, columns=columns)
+    return df if path != source else typed_chunk(df, date_format)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert a ride file to the typed Parquet cache.")
+    parser.add_argument('source', help="ride export (.xlsx or .csv)")
+    parser.add_argument('--cache-dir', default=DATASET_CACHE_DIR)
+    parser.add_argument('--date-format', default=DATE_FORMAT, help="format of string Tanggal values")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    path = cached_dataset(args.source, args.cache_dir, date_format=args.date_format)
+    print(f"Cache {path} ready in {time.perf_counter() - start:.2f}s")
+    start = time.perf_counter()
+    df = load_rides(args.source, args.cache_dir, date_format=args.date_format)
+    print(f"Loaded {len(df):,} rows from cache in {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+"""Export the joblib model package to XGBoost's native format.
+
+The joblib package pickles a sklearn XGBRegressor, StandardScaler,
+LabelEncoders and a pandas DataFrame, so loading it needs sklearn and
+pandas at matching versions. The export writes the booster with
+Booster.save_model (UBJSON or JSON) plus a small JSON sidecar with
+everything else inference needs; load_native() reads it back with only
+xgboost and NumPy. A .npz output instead stores the trees compiled to flat
+arrays (see trees.py), which load and predict with NumPy alone.
+
+With fold_scaler the StandardScaler is folded into the split thresholds:
+trees split on (x - mean) / scale < t, which is x < t * scale + mean, so the
+exported model takes raw feature values and serving skips scaling.
+
+    python -m cycling_speed.export                       # joblib -> .ubj + .meta.json
+    python -m cycling_speed.export --output models/m.json
+    python -m cycling_speed.export --output models/m.npz # no libxgboost needed to serve
+    python -m cycling_speed.export --fold-scaler          # raw-unit thresholds, no scaling step
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+from cycling_speed.inference import MODEL_PATH, unpack_model
+
+NATIVE_MODEL_PATH = "./models/cycling_speed_prediction_model_v2.ubj"
+NATIVE_FORMATS = ('.ubj', '.json')
+COMPILED_FORMATS = ('.npz',)
+
+
+def sidecar_path(path):
+    """Metadata file stored next to a native booster file (one per export)."""
+    return str(path) + '.meta.json'
+
+
+def is_native_path(path):
+    """True for exports that load without unpickling (native booster or compiled trees)."""
+    return os.path.splitext(str(path))[1].lower() in NATIVE_FORMATS + COMPILED_FORMATS
+
+
+def is_compiled_path(path):
+    """True for trees compiled to NumPy arrays (served without xgboost)."""
+    return os.path.splitext(str(path))[1].lower() in COMPILED_FORMATS
+
+
+def _to_json(value):
+    """Convert NumPy/pandas values in package metadata to plain JSON types."""
+    if isinstance(value, dict):
+        return {str(k): _to_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_json(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def package_metadata(model_package):
+    """Everything except the booster, as JSON-serializable data."""
+    _, encoder_classes, mean, scale = unpack_model(model_package)
+    metadata = {
+        'feature_columns': list(model_package['feature_columns']),
+        'encoder_classes': {name: [str(c) for c in classes] for name, classes in encoder_classes.items()},
+        'scaler': None if mean is None else {'mean': mean.tolist(), 'scale': scale.tolist()},
+        'model_performance': _to_json(model_package.get('model_performance', {})),
+        'training_info': _to_json(model_package.get('training_info', {})),
+    }
+    importance = model_package.get('feature_importance')
+    if importance is not None:
+        if hasattr(importance, 'to_dict'):
+            importance = dict(zip(importance['feature'], importance['importance']))
+        metadata['feature_importance'] = _to_json(importance)
+    return metadata
+
+
+def _float32_keys(x):
+    """Integers ordered like the float32 values ``x`` (adjacent floats differ by 1)."""
+    bits = np.asarray(x, dtype=np.float32).view(np.int32).astype(np.int64)
+    return np.where(bits < 0, -(bits & 0x7FFFFFFF), bits)
+
+
+def _from_float32_keys(keys):
+    bits = np.where(keys < 0, -keys | 0x80000000, keys)
+    return bits.astype(np.uint32).view(np.float32)
+
+
+def _raw_thresholds(threshold, mean, scale):
+    """Smallest float32 raw values that no longer satisfy the scaled split.
+
+    Split cut points often coincide with actual feature values (integer hours,
+    sleep, zero rain), so ``t * scale + mean`` rounded either way would send
+    those rows down the wrong branch. Instead bisect over float32 values for
+    the exact boundary of ``float32((x - mean) / scale) < t``; near zero that
+    boundary can be millions of float32 steps from the estimate.
+    """
+    threshold = np.asarray(threshold, dtype=np.float32)
+    largest = _float32_keys(np.float32(np.finfo(np.float32).max))
+
+    def goes_left(keys):
+        x = _from_float32_keys(keys).astype(np.float64)
+        return ((x - mean) / scale).astype(np.float32) < threshold
+
+    estimate = _float32_keys((threshold.astype(np.float64) * scale + mean).astype(np.float32))
+    # Widen a bracket [lo, hi] with goes_left(lo) and not goes_left(hi) around the estimate
+    lo, hi = estimate.copy(), estimate.copy()
+    step = np.ones_like(estimate)
+    for _ in range(40):
+        lo_bad = ~goes_left(lo) & (lo > -largest)
+        hi_bad = goes_left(hi) & (hi < largest)
+        if not (lo_bad.any() or hi_bad.any()):
+            break
+        lo = np.where(lo_bad, np.maximum(lo - step, -largest), lo)
+        hi = np.where(hi_bad, np.minimum(hi + step, largest), hi)
+        step *= 2
+    while True:
+        open_ = hi - lo > 1
+        if not open_.any():
+            break
+        mid = (lo + hi) // 2
+        left = goes_left(mid)
+        lo = np.where(open_ & left, mid, lo)
+        hi = np.where(open_ & ~left, mid, hi)
+    return _from_float32_keys(hi)
+
+
+def fold_scaler_into_trees(model_json, mean, scale):
+    """Rewrite split thresholds of a booster JSON dump from scaled to raw feature units (in place)."""
+    mean = np.asarray(mean, dtype=np.float64)
+    scale = np.asarray(scale, dtype=np.float64)
+    if np.any(scale <= 0):
+        raise ValueError("Scaler with non-positive scale cannot be folded")
+    for tree in model_json['learner']['gradient_booster']['model']['trees']:
+        left = np.asarray(tree['left_children'])
+        feature = np.asarray(tree['split_indices'])
+        conditions = np.asarray(tree['split_conditions'], dtype=np.float64)
+        internal = left != -1
+        # Leaves keep their values (stored in split_conditions too)
+        f = feature[internal]
+        conditions[internal] = _raw_thresholds(conditions[internal], mean[f], scale[f])
+        tree['split_conditions'] = conditions.tolist()
+    return model_json
+
+
+def export_native(model_package, path=NATIVE_MODEL_PATH, fold_scaler=False):
+    """Write the booster to ``path`` (.ubj/.json, or compiled .npz) and its metadata sidecar.
+
+    With ``fold_scaler`` the package's scaler is folded into the thresholds
+    and the sidecar records no scaler, so inputs are used in raw units.
+    """
+    if not is_native_path(path):
+        raise ValueError(f"Native model path must end with one of {NATIVE_FORMATS + COMPILED_FORMATS}: {path}")
+    booster, _, mean, scale = unpack_model(model_package)
+    metadata = package_metadata(model_package)
+    model_json = None
+    if fold_scaler and mean is not None:
+        model_json = fold_scaler_into_trees(json.loads(booster.save_raw('json')), mean, scale)
+        metadata['scaler'] = None
+        metadata['scaler_folded'] = True
+
+    if is_compiled_path(path):
+        from cycling_speed.trees import TreeEnsemble
+
+        ensemble = TreeEnsemble.from_booster(booster) if model_json is None else TreeEnsemble.from_model_json(model_json)
+        ensemble.save(path)
+    else:
+        if model_json is not None:
+            import xgboost as xgb
+
+            booster = xgb.Booster(model_file=bytearray(json.dumps(model_json).encode()))
+        booster.save_model(path)
+    with open(sidecar_path(path), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=1)
+    return path
+
+
+def load_native(path=NATIVE_MODEL_PATH, mmap_mode=None):
+    """Load a native export as a model package dict usable by SpeedPredictor.
+
+    The dict has the joblib package's metadata keys, with 'booster',
+    'encoder_classes' and a plain {'mean', 'scale'} 'scaler' in place of the
+    sklearn objects. For a compiled .npz, 'booster' is a NumPy TreeEnsemble,
+    memory-mapped from the file when ``mmap_mode`` is given.
+    """
+    with open(sidecar_path(path), encoding='utf-8') as f:
+        model_package = json.load(f)
+    if is_compiled_path(path):
+        from cycling_speed.trees import TreeEnsemble
+
+        model_package['booster'] = TreeEnsemble.load(path, mmap_mode)
+        return model_package
+
+    import xgboost as xgb
+
+    booster = xgb.Booster()
+    booster.load_model(path)
+    model_package['booster'] = booster
+    return model_package
+
+
+def load_package(path=MODEL_PATH, mmap_mode=None):
+    """Load a model package from a native export or a joblib file, by extension.
+
+    ``mmap_mode`` ('r') memory-maps the NumPy arrays of a compiled .npz or
+    an uncompressed joblib file instead of copying them into the process.
+    A native booster (.ubj/.json) is always parsed into XGBoost's own memory.
+    """
+    if is_native_path(path):
+        return load_native(path, mmap_mode)
+    import joblib
+
+    return joblib.load(path, mmap_mode=mmap_mode)
+
+
+def max_prediction_diff(package_a, package_b, n_rows=20_000, seed=0):
+    """Largest absolute difference in predicted speed between two packages.
+
+    Inputs are drawn on the prediction form's slider steps, plus the
+    boundaries of every category bin.
+    """
+    from cycling_speed.inference import SpeedPredictor
+
+    rng = np.random.default_rng(seed)
+    inputs = [
+        rng.integers(5, 71, n_rows) * 10.0,      # elevasi 50-700 step 10
+        rng.integers(10, 101, n_rows) / 2,       # jarak 5-50 step 0.5
+        rng.integers(0, 1001, n_rows) / 10,      # curah_hujan 0-100 step 0.1
+        rng.integers(1, 13, n_rows) * 1.0,       # jam_tidur 1-12
+        rng.integers(0, 24, n_rows) * 1.0,       # hour
+        rng.integers(0, 7, n_rows) * 1.0,        # day_of_week
+    ]
+    a = SpeedPredictor(package_a).predict(*inputs)
+    b = SpeedPredictor(package_b).predict(*inputs)
+    return float(np.max(np.abs(a - b)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the joblib model package to native XGBoost format.")
+    parser.add_argument('--package', default=MODEL_PATH, help="source model package (joblib or native)")
+    parser.add_argument('--output', default=NATIVE_MODEL_PATH, help="booster output (.ubj, .json or .npz)")
+    parser.add_argument('--fold-scaler', action='store_true', help="fold the StandardScaler into thresholds")
+    args = parser.parse_args(argv)
+
+    source = load_package(args.package)
+    path = export_native(source, args.output, fold_scaler=args.fold_scaler)
+    print(f"Exported {path} ({os.path.getsize(path) / 1024:.0f} KB) and {sidecar_path(path)}")
+    print(f"Parity vs {args.package}: max |diff| = {max_prediction_diff(source, load_package(path)):.2e} km/h")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+"""Columnar feature pipeline shared by training (model5.ipynb) and serving.
+
+Everything is computed on whole columns with np.digitize/np.select, so the
+notebook and the app build identical features: training calls
+engineer_features() on the ride DataFrame, serving calls
+build_feature_columns() with a speed estimate in place of the recorded one.
+"""
+import numpy as np
+
+# String format of Tanggal in the Strava export
+DATE_FORMAT = '%d/%m/%Y'
+
+# Category thresholds (same bins as the pd.cut calls in model5.ipynb).
+# pd.cut bins are right-closed and the first bin excludes its lower edge,
+# e.g. Elevasi bins [0, 150, 250, 400, inf]: 0 itself gets no category.
+TIME_BINS = [8, 12, 17]
+TIME_LABELS = ['Early_Morning', 'Morning', 'Afternoon', 'Evening']
+ELEVATION_BINS = [150, 250, 400]
+ELEVATION_LOWER = 0
+ELEVATION_LABELS = ['Flat', 'Rolling', 'Hilly', 'Mountainous']
+RAIN_BINS = [0, 10, 30]
+RAIN_LOWER = -0.1
+RAIN_LABELS = ['No_Rain', 'Light', 'Moderate', 'Heavy']
+DISTANCE_BINS = [20, 30, 40]
+DISTANCE_LOWER = 0
+DISTANCE_LABELS = ['Short', 'Medium', 'Long', 'Ultra']
+SLEEP_BINS = [4, 6, 8]
+SLEEP_LOWER = 0
+SLEEP_LABELS = ['Poor', 'Moderate', 'Good', 'Excellent']
+
+CATEGORICAL_FEATURES = {
+    'Time_Category': TIME_LABELS,
+    'Elevation_Category': ELEVATION_LABELS,
+    'Rain_Category': RAIN_LABELS,
+    'Distance_Category': DISTANCE_LABELS,
+    'Sleep_Quality': SLEEP_LABELS,
+}
+
+# Label of a missing category after .astype(str), as LabelEncoder saw it in training
+MISSING_LABEL = 'nan'
+
+NUMERIC_FEATURES = [
+    'Elevasi', 'Jarak', 'Curah_Hujan', 'Jam_Tidur', 'Hour', 'Day_of_Week',
+    'Speed_per_Elevation', 'Distance_per_Duration', 'Elevation_per_Distance',
+    'Rest_Factor', 'Weather_Impact',
+]
+# Model input columns, in the order used by model5.ipynb
+FEATURE_COLUMNS = (
+    NUMERIC_FEATURES
+    + [f'{name}_encoded' for name in CATEGORICAL_FEATURES]
+    + ['Is_Morning', 'Is_Weekend']
+)
+
+
+def _cut(values, bins, lower):
+    """pd.cut-style codes: right-closed bins, -1 at/below ``lower`` or for NaN."""
+    codes = np.digitize(values, bins, right=True)
+    return np.where(values > lower, codes, -1)
+
+
+def category_codes(elevasi, jarak, curah_hujan, jam_tidur, hour):
+    """Return integer category codes (index into the *_LABELS lists, -1 = missing) per row."""
+    return {
+        # hour < 8 -> Early_Morning, < 12 -> Morning, < 17 -> Afternoon; an unknown hour is missing,
+        # not Evening (np.digitize sorts NaN past the last bin)
+        'Time_Category': np.where(np.isfinite(hour), np.digitize(hour, TIME_BINS), -1),
+        'Elevation_Category': _cut(elevasi, ELEVATION_BINS, ELEVATION_LOWER),
+        'Rain_Category': _cut(curah_hujan, RAIN_BINS, RAIN_LOWER),
+        'Distance_Category': _cut(jarak, DISTANCE_BINS, DISTANCE_LOWER),
+        'Sleep_Quality': _cut(jam_tidur, SLEEP_BINS, SLEEP_LOWER),
+    }
+
+
+def category_labels(codes):
+    """Map category codes from category_codes() back to their string labels."""
+    return {name: np.asarray(CATEGORICAL_FEATURES[name] + [MISSING_LABEL])[code] for name, code in codes.items()}
+
+
+def encoder_lookup(encoder_classes):
+    """Build per-category arrays mapping our codes to LabelEncoder codes.
+
+    ``encoder_classes`` maps each categorical feature to its encoder's classes_.
+    The extra last entry serves code -1 (missing category). Labels the encoder
+    never saw during training map to NaN, which XGBoost routes down the
+    default (missing) branch.
+    """
+    lookup = {}
+    for name, labels in CATEGORICAL_FEATURES.items():
+        classes = {label: i for i, label in enumerate(encoder_classes[name])}
+        lookup[name] = np.array([classes.get(label, np.nan) for label in labels + [MISSING_LABEL]], dtype=np.float64)
+    return lookup
+
+
+def weather_impact(curah_hujan):
+    """Speed multiplier for rain: 1 when dry, 0.8 up to 10 mm, 0.6 up to 30 mm, else 0.4."""
+    return np.select([curah_hujan == 0, curah_hujan <= 10, curah_hujan <= 30], [1.0, 0.8, 0.6], 0.4)
+
+
+def build_feature_columns(elevasi, jarak, curah_hujan, jam_tidur, hour, day_of_week,
+                          durasi_menit, kec_rata_rata, encoders=None):
+    """Compute every model feature column as a NumPy array.
+
+    All inputs are array-likes broadcastable to a common length. With
+    ``encoders`` (the output of encoder_lookup()) the *_encoded columns are
+    included; the category codes are always returned under 'codes'.
+    """
+    elevasi, jarak, curah_hujan, jam_tidur, hour, day_of_week, durasi_menit, kec_rata_rata = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(v, dtype=np.float64)) for v in
+          (elevasi, jarak, curah_hujan, jam_tidur, hour, day_of_week, durasi_menit, kec_rata_rata))
+    )
+    codes = category_codes(elevasi, jarak, curah_hujan, jam_tidur, hour)
+
+    columns = {
+        'Elevasi': elevasi,
+        'Jarak': jarak,
+        'Curah_Hujan': curah_hujan,
+        'Jam_Tidur': jam_tidur,
+        'Hour': hour,
+        'Day_of_Week': day_of_week,
+        'Speed_per_Elevation': kec_rata_rata / (elevasi + 1),
+        'Distance_per_Duration': jarak / durasi_menit,
+        'Elevation_per_Distance': elevasi / jarak,
+        'Rest_Factor': jam_tidur / durasi_menit * 100,
+        'Weather_Impact': weather_impact(curah_hujan),
+        'Is_Morning': (hour < 12).astype(np.float64),
+        'Is_Weekend': (day_of_week >= 5).astype(np.float64),
+        'codes': codes,
+    }
+    if encoders is not None:
+        for name, code in codes.items():
+            columns[f'{name}_encoded'] = encoders[name][code]
+    return columns
+
+
+def build_feature_matrix(feature_columns, columns, dtype=np.float64):
+    """Stack computed columns into an (n_rows, n_features) matrix in model order."""
+    n_rows = len(columns['Elevasi'])
+    X = np.empty((n_rows, len(feature_columns)), dtype=dtype)
+    for j, name in enumerate(feature_columns):
+        X[:, j] = columns[name]
+    return X
+
+
+# ---- DataFrame helpers (pandas is imported lazily; serving needs NumPy only) ----
+
+def _parse_unique(values, parse):
+    """Apply a vectorized ``parse`` to the distinct values only and broadcast back.
+
+    Start times and ride dates repeat heavily, so this avoids per-row string work.
+    """
+    import pandas as pd
+
+    codes, uniques = pd.factorize(values)
+    parsed = np.append(parse(pd.Series(uniques)), np.nan)
+    return parsed[codes]
+
+
+def parse_start_times(values):
+    """Jam_Mulai column as time since midnight (timedelta64), parsed once per distinct value."""
+    import pandas as pd
+
+    values = pd.Series(values)
+    if pd.api.types.is_timedelta64_dtype(values):
+        return values
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values - values.dt.normalize()
+    if pd.api.types.is_numeric_dtype(values):
+        return pd.to_timedelta(values, unit='h')
+    # "HH:MM[:SS]" strings and datetime.time objects (which stringify as HH:MM:SS)
+    codes, uniques = pd.factorize(values)
+    text = pd.Series(uniques).astype(str)
+    text = text.where(text.str.count(':') != 1, text + ':00')
+    parsed = pd.to_timedelta(text, errors='coerce').to_numpy()
+    return pd.Series(np.append(parsed, np.timedelta64('NaT'))[codes], index=values.index)
+
+
+def start_hours(values):
+    """Hour of day from a Jam_Mulai column (time objects, strings, datetimes, timedeltas or hours)."""
+    import pandas as pd
+
+    values = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy(dtype=np.float64)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.dt.hour.to_numpy(dtype=np.float64)
+    if pd.api.types.is_timedelta64_dtype(values):
+        return np.floor(values.dt.total_seconds().to_numpy(dtype=np.float64) / 3600)
+    # "HH:MM[:SS]" strings and datetime.time objects both stringify as HH:MM:SS
+    return _parse_unique(values, lambda u: pd.to_numeric(
+        u.astype(str).str.partition(':')[0], errors='coerce').to_numpy(dtype=np.float64))
+
+
+def parse_dates(values, date_format=DATE_FORMAT):
+    """Tanggal column as datetime64 (string values parsed once per distinct date).
+
+    Values not in ``date_format`` are tried as ISO 8601 (e.g. re-saved exports).
+    """
+    import pandas as pd
+
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Series(uniques)
+    parsed = pd.to_datetime(uniques, format=date_format, errors='coerce')
+    missing = parsed.isna()
+    if missing.any():
+        parsed[missing] = pd.to_datetime(uniques[missing].astype(str), format='ISO8601', errors='coerce')
+    parsed = parsed.to_numpy()
+    return pd.Series(np.append(parsed, np.datetime64('NaT'))[codes], index=values.index)
+
+
+def days_of_week(values, date_format=DATE_FORMAT):
+    """Day of week (Monday=0) from a Tanggal column."""
+    return parse_dates(values, date_format).dt.dayofweek.to_numpy(dtype=np.float64)
+
+
+def ride_timestamps(df, date_format=DATE_FORMAT):
+    """Start of each ride (Tanggal + Jam_Mulai) as a datetime64 Series."""
+    return parse_dates(df['Tanggal'], date_format) + parse_start_times(df['Jam_Mulai'])
+
+
+def engineer_features(df, date_format=DATE_FORMAT):
+    """Add the notebook's engineered columns to a ride DataFrame (returns a copy).
+
+    Needs Tanggal, Jam_Mulai, Durasi_Menit, Elevasi, Jarak, Kec_Rata_Rata,
+    Curah_Hujan and Jam_Tidur. Categories come out as ordered Categoricals,
+    like pd.cut, with NaN where pd.cut would give none.
+    """
+    import pandas as pd
+
+    df = df.copy()
+    df['Tanggal'] = parse_dates(df['Tanggal'], date_format)
+    hour = start_hours(df['Jam_Mulai'])
+    day_of_week = df['Tanggal'].dt.dayofweek.to_numpy(dtype=np.float64)
+    columns = build_feature_columns(
+        df['Elevasi'], df['Jarak'], df['Curah_Hujan'], df['Jam_Tidur'], hour, day_of_week,
+        df['Durasi_Menit'], df['Kec_Rata_Rata'],
+    )
+
+    df['Hour'] = hour
+    df['Is_Morning'] = columns['Is_Morning'].astype(int)
+    df['Day_of_Week'] = df['Tanggal'].dt.dayofweek
+    df['Is_Weekend'] = columns['Is_Weekend'].astype(int)
+    for name, code in columns['codes'].items():
+        df[name] = pd.Categorical.from_codes(code, categories=CATEGORICAL_FEATURES[name], ordered=True)
+    for name in ('Speed_per_Elevation', 'Distance_per_Duration', 'Elevation_per_Distance',
+                 'Rest_Factor', 'Weather_Impact'):
+        df[name] = columns[name]
+    return df
@@ -0,0 +1,227 @@
+"""Incremental model updates from newly added rides.
+
+Instead of rerunning the whole notebook, update_package() takes the rides
+recorded after the package's last ride and either
+
+* 'continue': boosts ``rounds`` more trees on the new rows only, starting
+  from the existing booster (same scaler and encoders), or
+* 'window': refits the tuned parameters on the most recent ``window`` rides
+  with a fresh scaler and encoders.
+
+The last part (chronologically) of the new rides, at least
+MIN_HOLDOUT_RIDES, is held out to score the updated model against the
+current one. The result is a new package with a
+bumped ``training_info['version']``, written next to the old one.
+
+    python -m cycling_speed.incremental --data Book1.xlsx --since 2024-12-01
+    python -m cycling_speed.incremental --mode window --window 500
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+from cycling_speed import features
+from cycling_speed.inference import MODEL_PATH, unpack_model
+
+UPDATE_MODES = ('continue', 'window')
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+# Fewest new rides held out to evaluate an update
+MIN_HOLDOUT_RIDES = 5
+
+
+def versioned_path(path, version):
+    """``models/m.joblib`` -> ``models/m.v3.joblib``."""
+    stem, ext = os.path.splitext(path)
+    stem = stem.rsplit('.v', 1)[0] if stem.rsplit('.v', 1)[-1].isdigit() else stem
+    return f"{stem}.v{version}{ext}"
+
+
+def select_new_rides(df, since):
+    """Rides that started strictly after ``since``, oldest first."""
+    import pandas as pd
+
+    started = features.ride_timestamps(df)
+    new = df[started > pd.Timestamp(since)]
+    return new.iloc[np.argsort(started[new.index].to_numpy(), kind='stable')]
+
+
+def ride_matrix(model_package, df):
+    """Feature matrix of recorded rides, encoded and scaled like the package's training data."""
+    _, encoder_classes, mean, scale = unpack_model(model_package)
+    hour = features.start_hours(df['Jam_Mulai'])
+    day_of_week = features.days_of_week(df['Tanggal'])
+    columns = features.build_feature_columns(
+        df['Elevasi'], df['Jarak'], df['Curah_Hujan'], df['Jam_Tidur'], hour, day_of_week,
+        df['Durasi_Menit'], df['Kec_Rata_Rata'], features.encoder_lookup(encoder_classes),
+    )
+    X = features.build_feature_matrix(model_package['feature_columns'], columns)
+    if mean is not None:
+        X = (X - mean) / scale
+    return X
+
+
+def regression_metrics(y_true, y_pred):
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+    return {
+        'test_mae': mean_absolute_error(y_true, y_pred),
+        'test_r2': r2_score(y_true, y_pred) if len(y_true) > 1 else float('nan'),
+        'test_rmse': np.sqrt(mean_squared_error(y_true, y_pred)),
+    }
+
+
+def _continue_boosting(model_package, train, rounds, learning_rate):
+    import xgboost as xgb
+
+    model = model_package['model']
+    params = model.get_params()
+    params['n_estimators'] = rounds
+    if learning_rate is not None:
+        params['learning_rate'] = learning_rate
+    updated = xgb.XGBRegressor(**params)
+    updated.fit(ride_matrix(model_package, train), train['Kec_Rata_Rata'].to_numpy(), xgb_model=model.get_booster())
+    package = dict(model_package, model=updated)
+    return package, updated.get_booster().num_boosted_rounds()
+
+
+def _refit_window(model_package, train):
+    import xgboost as xgb
+    from sklearn.preprocessing import StandardScaler
+
+    from cycling_speed.training import encode_features
+
+    data = encode_features(train)
+    scaler = StandardScaler()
+    params = dict(model_package['training_info'].get('best_params', {}))
+    model = xgb.XGBRegressor(random_state=42, **params)
+    model.fit(scaler.fit_transform(data['X']), data['y'])
+    package = dict(model_package, model=model, scaler=scaler, label_encoders=data['label_encoders'],
+                   feature_columns=list(data['X'].columns))
+    return package, model.get_booster().num_boosted_rounds()
+
+
+def update_package(model_package, rides, since=None, mode='continue', rounds=50, window=None,
+                   test_size=0.2, learning_rate=None):
+    """Return a new model package updated with the rides recorded after ``since``.
+
+    ``rides`` is the full (cleaned) ride history; ``since`` defaults to the
+    package's ``training_info['last_ride']``. Mode 'continue' trains on the
+    new rides only; 'window' refits on the latest ``window`` rides (all of
+    them if None). Raises ValueError when there are too few new rides to
+    hold out MIN_HOLDOUT_RIDES and still train on some.
+    """
+    import xgboost as xgb
+
+    if mode not in UPDATE_MODES:
+        raise ValueError(f"Unknown update mode {mode!r}; use one of {UPDATE_MODES}")
+    if not isinstance(model_package.get('model'), xgb.XGBRegressor):
+        raise ValueError("Incremental updates need a training package whose 'model' is an xgboost.XGBRegressor, "
+                         "not a native export")
+    if 'test_mae' not in model_package.get('model_performance', {}):
+        raise ValueError("Package has no model_performance['test_mae'] to compare the update with")
+    info = model_package.get('training_info', {})
+    since = since or info.get('last_ride')
+    if since is None:
+        raise ValueError("Package has no training_info['last_ride']; pass since=")
+
+    new = select_new_rides(rides, since)
+    if new.empty:
+        raise ValueError(f"No rides after {since}")
+    # Newest rides are held out to compare the updated model with the current one
+    n_test = max(int(len(new) * test_size), MIN_HOLDOUT_RIDES)
+    if len(new) <= n_test:
+        raise ValueError(f"{len(new)} rides after {since}; need more than {n_test} to train and hold out {n_test}")
+    holdout = new.iloc[len(new) - n_test:]
+    fresh = new.iloc[:len(new) - n_test]
+
+    start = time.perf_counter()
+    if mode == 'continue':
+        package, n_trees = _continue_boosting(model_package, fresh, rounds, learning_rate)
+        # The boosted model has seen the parent's rows plus the fresh ones
+        original_samples = int(info.get('original_samples', 0)) + len(fresh)
+        augmented_samples = int(info.get('augmented_samples', 0)) + len(fresh)
+        trained = len(fresh)
+    else:
+        history = rides[features.ride_timestamps(rides) <= features.ride_timestamps(fresh).max()]
+        history = history.iloc[np.argsort(features.ride_timestamps(history).to_numpy(), kind='stable')]
+        history = history if window is None else history.iloc[-window:]
+        package, n_trees = _refit_window(model_package, history)
+        # A fresh model trained on the window alone, without augmentation
+        original_samples = augmented_samples = trained = len(history)
+    fit_seconds = time.perf_counter() - start
+
+    model = package['model']
+    y_test = holdout['Kec_Rata_Rata'].to_numpy()
+    performance = regression_metrics(y_test, model.predict(ride_matrix(package, holdout)))
+    previous = regression_metrics(y_test, model_package['model'].predict(ride_matrix(model_package, holdout)))
+    performance.update(holdout_rows=n_test, previous_test_mae=previous['test_mae'])
+    package['model_performance'] = performance
+    package['feature_importance'] = _feature_importance(package)
+    version = int(info.get('version', 1)) + 1
+    package['training_info'] = {
+        **info,
+        'original_samples': original_samples,
+        'augmented_samples': augmented_samples,
+        'best_params': {**info.get('best_params', {}), 'n_estimators': n_trees},
+        'training_date': datetime.now().strftime(TIMESTAMP_FORMAT),
+        'last_ride': features.ride_timestamps(new).max().strftime(TIMESTAMP_FORMAT),
+        'version': version,
+        'parent_version': int(info.get('version', 1)),
+        'parent_training_date': info.get('training_date'),
+        'update_mode': mode,
+        'new_samples': len(new),
+        'trained_samples': trained,
+        'update_seconds': fit_seconds,
+    }
+    return package
+
+
+def _feature_importance(model_package):
+    import pandas as pd
+
+    return pd.DataFrame({
+        'feature': model_package['feature_columns'],
+        'importance': model_package['model'].feature_importances_,
+    }).sort_values('importance', ascending=False)
+
+
+def main(argv=None):
+    import joblib
+
+    from cycling_speed.dataset import load_rides
+    from cycling_speed.training import DEFAULT_CONFIG, clean_rides
+
+    parser = argparse.ArgumentParser(description="Update the model with rides added since its last training.")
+    parser.add_argument('--data', default=DEFAULT_CONFIG['load']['data_path'], help="ride export with the new rides")
+    parser.add_argument('--model', default=MODEL_PATH, help="joblib package to update")
+    parser.add_argument('--output', default=None, help="output package (default: <model>.v<N>.joblib)")
+    parser.add_argument('--since', default=None, help="take rides after this time (default: package's last_ride)")
+    parser.add_argument('--mode', choices=UPDATE_MODES, default='continue')
+    parser.add_argument('--rounds', type=int, default=50, help="trees added in continue mode")
+    parser.add_argument('--learning-rate', type=float, default=None, help="learning rate for the added trees")
+    parser.add_argument('--window', type=int, default=None, help="rides kept in window mode")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    model_package = joblib.load(args.model)
+    rides = clean_rides(load_rides(args.data))
+    try:
+        package = update_package(model_package, rides, args.since, args.mode, args.rounds, args.window,
+                                 learning_rate=args.learning_rate)
+    except ValueError as e:
+        parser.exit(1, f"Cannot update: {e}\n")
+    info = package['training_info']
+    output = args.output or versioned_path(args.model, info['version'])
+    joblib.dump(package, output)
+    print(f"{info['new_samples']} new rides, {args.mode} update in {info['update_seconds']:.2f}s "
+          f"(total {time.perf_counter() - start:.2f}s) -> {output}")
+    performance = package['model_performance']
+    print(f"Holdout MAE on {performance['holdout_rows']} newest rides: "
+          f"{performance['previous_test_mae']:.3f} -> {performance['test_mae']:.3f} km/h")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Batched inference for the trained XGBoost model package."""
+import datetime
+import os
+
+import numpy as np
+
+from cycling_speed import features, metrics
+
+# Model package location (relative to the app root); a native export (.ubj/.json) also works
+MODEL_PATH = os.environ.get("MODEL_PATH", "./models/cycling_speed_prediction_model_v2.joblib")
+
+# Output range used by the app (same clipping as the demo heuristic)
+MIN_SPEED = 10.0
+MAX_SPEED = 35.0
+
+
+def heuristic_speed(elevasi, jarak, curah_hujan, jam_tidur, hour):
+    """Vectorized, noise-free version of the app's demo heuristic (km/h)."""
+    elevasi, jarak, curah_hujan, jam_tidur, hour = (
+        np.asarray(v, dtype=np.float64) for v in (elevasi, jarak, curah_hujan, jam_tidur, hour)
+    )
+    distance_factor = np.maximum(0.85, 1 - (jarak - 25) * 0.01)
+    elevation_factor = np.maximum(0.7, 1 - (elevasi - 200) * 0.001)
+    rain_factor = np.where(curah_hujan == 0, 1.0, np.maximum(0.6, 1 - curah_hujan * 0.01))
+    sleep_factor = np.minimum(1.1, 0.8 + jam_tidur * 0.04)
+    time_factor = np.select([(hour >= 6) & (hour <= 10), (hour > 10) & (hour <= 16)], [1.05, 1.0], 0.95)
+    speed = 22.0 * distance_factor * elevation_factor * rain_factor * sleep_factor * time_factor
+    return np.clip(speed, MIN_SPEED, MAX_SPEED)
+
+
+def has_model(model_package):
+    """True for a joblib package from model5.ipynb or a native export (see export.load_native)."""
+    return 'model' in model_package or 'booster' in model_package
+
+
+def unpack_model(model_package):
+    """Return (booster, encoder_classes, scaler_mean, scaler_scale) from either package format."""
+    if 'booster' in model_package:
+        booster = model_package['booster']
+        encoder_classes = model_package['encoder_classes']
+        scaler = model_package.get('scaler')
+        mean, scale = (None, None) if scaler is None else (scaler['mean'], scaler['scale'])
+    else:
+        model = model_package['model']
+        booster = model.get_booster() if hasattr(model, 'get_booster') else model
+        encoder_classes = {name: encoder.classes_ for name, encoder in model_package['label_encoders'].items()}
+        scaler = model_package.get('scaler')
+        mean, scale = (None, None) if scaler is None else (scaler.mean_, scaler.scale_)
+    if mean is not None:
+        mean, scale = np.asarray(mean, dtype=np.float64), np.asarray(scale, dtype=np.float64)
+    return booster, encoder_classes, mean, scale
+
+
+class SpeedPredictor:
+    """Serve predictions from a model package saved by model5.ipynb (or its native export).
+
+    Speed_per_Elevation, Distance_per_Duration and Rest_Factor were derived
+    from the recorded ride speed/duration during training, which is unknown
+    at prediction time. They are filled in from a speed estimate: the
+    heuristic speed first, then the model's own prediction for each extra
+    refinement pass. Each pass is a single booster call over the whole batch.
+    """
+
+    def __init__(self, model_package, refine_steps=0):
+        self.booster, encoder_classes, self.mean, self.scale = unpack_model(model_package)
+        self.feature_columns = list(model_package['feature_columns'])
+        self.encoders = features.encoder_lookup(encoder_classes)
+        self.refine_steps = refine_steps
+
+    def build_features(self, elevasi, jarak, curah_hujan, jam_tidur, hour, day_of_week=None, speed=None):
+        """Return the scaled (n_rows, n_features) matrix fed to the booster."""
+        if day_of_week is None:
+            day_of_week = datetime.date.today().weekday()
+        if speed is None:
+            speed = heuristic_speed(elevasi, jarak, curah_hujan, jam_tidur, hour)
+        with metrics.timer('feature_build'):
+            durasi_menit = np.asarray(jarak, dtype=np.float64) / speed * 60
+            columns = features.build_feature_columns(
+                elevasi, jarak, curah_hujan, jam_tidur, hour, day_of_week, durasi_menit, speed, self.encoders
+            )
+            X = features.build_feature_matrix(self.feature_columns, columns)
+        if self.mean is not None:
+            with metrics.timer('scaling'):
+                X -= self.mean
+                X /= self.scale
+        return X
+
+    def predict(self, elevasi, jarak, curah_hujan, jam_tidur, hour, day_of_week=None):
+        """Predict average speed (km/h) for one or many rows; inputs broadcast."""
+        speed = None
+        for _ in range(self.refine_steps + 1):
+            X = self.build_features(elevasi, jarak, curah_hujan, jam_tidur, hour, day_of_week, speed)
+            with metrics.timer('booster_predict'):
+                raw = self.booster.inplace_predict(X)
+            speed = np.clip(raw, MIN_SPEED, MAX_SPEED).astype(np.float64)
+        return speed
+
+    def predict_one(self, elevasi, jarak, curah_hujan, jam_tidur, jam_mulai, tanggal=None):
+        """Predict a single ride from the app's form values."""
+        day_of_week = None if tanggal is None else tanggal.weekday()
+        return float(self.predict([elevasi], [jarak], [curah_hujan], [jam_tidur], [jam_mulai.hour], day_of_week)[0])
+
+
+def categorize(elevasi, jarak, curah_hujan, jam_tidur, hour):
+    """Return (time, elevation, rain, distance, sleep) category label arrays."""
+    labels = features.category_labels(features.category_codes(
+        np.asarray(elevasi), np.asarray(jarak), np.asarray(curah_hujan), np.asarray(jam_tidur), np.asarray(hour)
+    ))
+    return tuple(labels[name] for name in features.CATEGORICAL_FEATURES)
@@ -0,0 +1,333 @@
+"""Background model loading and warm-up, off the page's import path.
+
+The first visitor after a deploy used to pay the joblib unpickle plus the
+xgboost/sklearn import inside the page script. ModelLoader does that work
+in a daemon thread as soon as any page starts it, runs a dummy prediction
+so the first real request is warm, and exposes a readiness flag.
+
+Model arrays are memory-mapped (MODEL_MMAP_MODE, default 'r'; empty to
+copy): the compiled .npz trees, the arrays of an uncompressed joblib
+package and the lookup table are then read from the page cache, so several
+app processes on one host share a single copy.
+
+When the app serves from the model registry (registry.py), RegistryLoader
+keeps watching the manifest and hot-swaps the model when another version
+is promoted, without a server restart.
+
+    python -m cycling_speed.loader        # measure cold start in a fresh process
+    python -m cycling_speed.loader --workers 4 --model models/m.npz   # per-process memory
+"""
+import argparse
+import datetime
+import logging
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from cycling_speed import metrics
+from cycling_speed.export import is_compiled_path, is_native_path, load_package
+from cycling_speed.inference import MODEL_PATH, SpeedPredictor, has_model
+from cycling_speed.lookup import LOOKUP_PATH, load_lookup_table
+from cycling_speed.registry import current_entry, default_model_path, manifest_path, verify
+
+logger = logging.getLogger(__name__)
+
+# mmap_mode for model arrays ('r' shares them between processes; '' loads private copies)
+MMAP_MODE = os.environ.get("MODEL_MMAP_MODE", "r") or None
+
+# Form defaults used for the warm-up prediction
+WARMUP_INPUTS = (200, 25.0, 0.0, 7, datetime.time(6, 0))
+# Seconds between checks of the registry manifest
+POLL_INTERVAL = float(os.environ.get("MODEL_REGISTRY_POLL", 5))
+
+
+def make_predictor(model_package, lookup_path=LOOKUP_PATH, mmap_mode=MMAP_MODE):
+    """Precomputed lookup table if one matches the model; otherwise the booster."""
+    if not has_model(model_package):
+        return None
+    try:
+        lookup_table = load_lookup_table(lookup_path, model_package, mmap_mode)
+    except Exception:
+        logger.exception("Ignoring lookup table %s", lookup_path)
+        lookup_table = None
+    return lookup_table if lookup_table is not None else SpeedPredictor(model_package)
+
+
+class ModelLoader:
+    """Load a model package and its predictor in a background thread.
+
+    ``ready`` turns True once loading finished (successfully or not);
+    ``wait()`` blocks until then. On failure ``model_package`` is None and
+    ``error`` holds the exception. ``timings`` records seconds per stage.
+    Use snapshot() to read the package and predictor of one same model.
+    """
+
+    def __init__(self, path=MODEL_PATH, lookup_path=LOOKUP_PATH, mmap_mode=MMAP_MODE):
+        self.path = path
+        self.lookup_path = lookup_path
+        self.mmap_mode = mmap_mode
+        self._active = (None, None)
+        self.error = None
+        self.timings = {}
+        self._done = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self._done.is_set()
+
+    @property
+    def model_package(self):
+        return self._active[0]
+
+    @property
+    def predictor(self):
+        return self._active[1]
+
+    def snapshot(self):
+        """``(model_package, predictor)`` of the same model, even while a new one is swapped in."""
+        return self._active
+
+    def start(self):
+        """Start loading (once); returns self so it can be chained."""
+        with self._lock:
+            if self._thread is None:
+                # plotly looks pandas up in sys.modules without taking the import
+                # lock, so it must not see a half-imported pandas from our thread.
+                # The page needs pandas for its charts anyway.
+                import pandas  # noqa: F401
+                self._thread = threading.Thread(target=self._run, name='model-loader', daemon=True)
+                self._thread.start()
+        return self
+
+    def wait(self, timeout=None):
+        """Start if needed and block until loading is done; returns ``ready``."""
+        self.start()
+        return self._done.wait(timeout)
+
+    def _resolve(self):
+        """Path of the package file to load."""
+        return self.path
+
+    def _load(self, path, timings):
+        """Load and warm up the package at ``path``; returns ``(model_package, predictor)``."""
+        start = last = time.perf_counter()
+
+        def lap(name):
+            nonlocal last
+            now = time.perf_counter()
+            timings[name] = now - last
+            last = now
+
+        if not is_native_path(path):
+            import joblib  # noqa: F401
+        if not is_compiled_path(path):
+            import xgboost  # noqa: F401  (needed by the load anyway; timed separately)
+        lap('import_s')
+        model_package = load_package(path, self.mmap_mode)
+        lap('load_s')
+        predictor = make_predictor(model_package, self.lookup_path, self.mmap_mode)
+        lap('predictor_s')
+        if predictor is not None:
+            predictor.predict_one(*WARMUP_INPUTS)
+            elevasi, jarak, curah_hujan, jam_tidur, jam_mulai = WARMUP_INPUTS
+            predictor.predict([elevasi] * 5, [jarak] * 5, [curah_hujan] * 5, [jam_tidur] * 5, [jam_mulai.hour] * 5)
+        lap('warmup_s')
+        metrics.observe('model_load', time.perf_counter() - start)
+        return model_package, predictor
+
+    def _run(self):
+        timings = {}
+        start = time.perf_counter()
+        try:
+            self._active = self._load(self._resolve(), timings)
+        except Exception as e:
+            if not isinstance(e, FileNotFoundError):
+                logger.exception("Failed to load model package %s", self.path)
+            self.error = e
+        timings['total_s'] = time.perf_counter() - start
+        self.timings = timings
+        logger.info("Model cold start: %s", format_timings(timings))
+        self._done.set()
+
+
+class RegistryLoader(ModelLoader):
+    """ModelLoader for the registry's current version that follows promotions.
+
+    After the first load a daemon thread checks the manifest every
+    ``poll_interval`` seconds. When another version is promoted it is
+    verified, loaded and warmed up in the background, then swapped in with
+    a single assignment; requests holding a snapshot() finish on the old
+    model. If the new version fails to load, the current one keeps serving.
+    ``entry`` is the manifest entry being served and ``swaps`` counts swaps.
+    """
+
+    def __init__(self, registry_dir, lookup_path=LOOKUP_PATH, mmap_mode=MMAP_MODE, poll_interval=POLL_INTERVAL):
+        super().__init__(registry_dir, lookup_path, mmap_mode)
+        self.poll_interval = poll_interval
+        self.entry = None
+        self.swaps = 0
+        self._manifest_mtime = None
+        self._stop = threading.Event()
+
+    def _manifest_changed(self):
+        try:
+            mtime = os.stat(manifest_path(self.path)).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        changed, self._manifest_mtime = mtime != self._manifest_mtime, mtime
+        return changed
+
+    def _resolve(self):
+        self._manifest_changed()
+        entry = current_entry(self.path)
+        if entry is None:
+            raise FileNotFoundError(f"No model version promoted in {self.path}")
+        path = verify(entry, self.path)
+        self.entry = entry
+        return path
+
+    def _run(self):
+        super()._run()
+        while not self._stop.wait(self.poll_interval):
+            if self._manifest_changed():
+                self.reload()
+
+    def reload(self):
+        """Swap in the current version if it isn't the one served; returns True on a swap."""
+        try:
+            entry = current_entry(self.path)
+            if entry is None or (self.entry is not None and entry['version'] == self.entry['version']):
+                return False
+            timings = {}
+            start = time.perf_counter()
+            # Build and warm the new predictor first; the swap itself is one assignment
+            self._active = self._load(verify(entry, self.path), timings)
+            timings['total_s'] = time.perf_counter() - start
+        except Exception:
+            logger.exception("Failed to load registry version; still serving %s",
+                             None if self.entry is None else f"v{self.entry['version']}")
+            return False
+        self.entry = entry
+        self.error = None
+        self.timings = timings
+        self.swaps += 1
+        logger.info("Swapped in model v%s: %s", entry['version'], format_timings(timings))
+        return True
+
+    def stop(self):
+        """Stop watching the manifest."""
+        self._stop.set()
+
+
+def format_timings(timings):
+    return ", ".join(f"{name[:-2]} {seconds:.3f}s" for name, seconds in timings.items())
+
+
+_loaders = {}
+_loaders_lock = threading.Lock()
+
+
+def get_loader(path=None, lookup_path=LOOKUP_PATH):
+    """Process-wide loader for ``path``, shared by every page and session.
+
+    ``path`` defaults to the model registry if one exists, else MODEL_PATH;
+    a registry directory gets a RegistryLoader.
+    """
+    path = default_model_path() if path is None else path
+    with _loaders_lock:
+        key = (path, lookup_path)
+        if key not in _loaders:
+            loader_class = RegistryLoader if os.path.isdir(path) else ModelLoader
+            _loaders[key] = loader_class(path, lookup_path)
+        return _loaders[key]
+
+
+def process_memory():
+    """Resident memory of this process in MB: rss, and on Linux pss (shared pages split
+    between the processes mapping them) and shared (pages also mapped elsewhere)."""
+    try:
+        with open('/proc/self/smaps_rollup', encoding='ascii') as f:
+            fields = dict(re.findall(r'^(\w+):\s+(\d+) kB', f.read(), re.MULTILINE))
+    except OSError:
+        import resource
+
+        return {'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+    kb = {name: int(value) for name, value in fields.items()}
+    return {'rss_mb': kb['Rss'] / 1024, 'pss_mb': kb['Pss'] / 1024,
+            'shared_mb': (kb['Shared_Clean'] + kb['Shared_Dirty']) / 1024}
+
+
+def _memory_worker(path, lookup_path, mmap_mode, barrier, results):
+    # Import everything first so 'before' covers the interpreter and libraries only
+    if not is_compiled_path(path):
+        import xgboost  # noqa: F401
+    import joblib  # noqa: F401
+    import pandas  # noqa: F401
+    before = process_memory()
+    loader = ModelLoader(path, lookup_path, mmap_mode)
+    loader.wait()
+    if loader.predictor is not None:
+        # Touch every tree and table page, as serving eventually does
+        rng = np.random.default_rng(0)
+        loader.predictor.predict(rng.uniform(50, 700, 2_000), rng.uniform(5, 50, 2_000),
+                                 rng.uniform(0, 100, 2_000), rng.uniform(1, 12, 2_000), rng.integers(0, 24, 2_000))
+    # Measure while every worker holds its model, so shared pages count once in total PSS
+    barrier.wait()
+    results.put((os.getpid(), before, process_memory(), repr(loader.error) if loader.error else None))
+    barrier.wait()
+
+
+def memory_report(path, lookup_path=LOOKUP_PATH, mmap_mode=MMAP_MODE, workers=4):
+    """Start ``workers`` processes that each load the model; returns their memory before/after loading."""
+    import multiprocessing
+
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [context.Process(target=_memory_worker, args=(path, lookup_path, mmap_mode, barrier, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    report = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure model cold start, or per-process memory with --workers.")
+    parser.add_argument('--model', default=None, help="package, export or registry (default: as served)")
+    parser.add_argument('--lookup', default=LOOKUP_PATH, help="lookup table path")
+    parser.add_argument('--workers', type=int, default=0, help="processes for the memory report")
+    parser.add_argument('--mmap-mode', default=MMAP_MODE or '', help="'r' to memory-map model arrays, '' to copy")
+    args = parser.parse_args(argv)
+
+    path = default_model_path() if args.model is None else args.model
+    if args.workers:
+        if os.path.isdir(path):
+            path = verify(current_entry(path), path)
+        print(f"{args.workers} workers loading {path} (mmap_mode={args.mmap_mode or None!r})")
+        print(f"{'pid':>8} {'RSS before':>11} {'RSS after':>10} {'PSS after':>10} {'shared':>8}")
+        report = memory_report(path, args.lookup, args.mmap_mode or None, args.workers)
+        for pid, before, after, error in report:
+            print(f"{pid:>8} {before['rss_mb']:>9.1f}MB {after['rss_mb']:>8.1f}MB "
+                  f"{after.get('pss_mb', float('nan')):>8.1f}MB {after.get('shared_mb', float('nan')):>6.1f}MB"
+                  f"{'  ' + error if error else ''}")
+        print(f"Total PSS {sum(after.get('pss_mb', 0) for _, _, after, _ in report):.1f} MB, "
+              f"model memory per worker {np.mean([a['rss_mb'] - b['rss_mb'] for _, b, a, _ in report]):.1f} MB RSS")
+        return
+    start = time.perf_counter()
+    loader = get_loader(path, args.lookup).start()
+    loader.wait()
+    if loader.error is not None:
+        print(f"Model failed to load: {loader.error!r}")
+    print(f"Cold start {time.perf_counter() - start:.3f}s ({format_timings(loader.timings)})")
+
+
+if __name__ == '__main__':
+    main()
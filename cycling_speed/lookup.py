@@ -0,0 +1,264 @@
+"""Precomputed prediction grid over the app's bounded input space.
+
+The form inputs are bounded and stepped, so the model can be scored offline
+over a grid and served from a memory-mapped array. The full slider grid
+(x7 weekdays) is ~12 billion cells, so the default grid is coarser and
+continuous inputs are linearly interpolated between grid points; hour and
+weekday are looked up exactly.
+
+Interpolation drifts from the booster, so build_lookup_table() measures the
+error against it on random slider-step inputs and records it in the
+sidecar. A table whose max error exceeds SPEED_LOOKUP_MAX_ERROR km/h
+(default 0.25) is not installed: the build raises and the CLI exits
+non-zero. load_lookup_table() likewise refuses such tables and unmeasured
+ones; the app then serves the booster.
+
+The current model changes its prediction at almost every slider step of
+elevation, distance and sleep (jumps of up to ~9 km/h between neighbouring
+steps), so no grid short of the full slider lattice meets 0.25 km/h; the
+default grid measures max 6.4 km/h. Serving a table is therefore opt-in:
+raise SPEED_LOOKUP_MAX_ERROR to the error you accept, for both the build
+and the app.
+
+    python -m cycling_speed.lookup                 # default coarse grid (fails the default tolerance)
+    SPEED_LOOKUP_MAX_ERROR=7 python -m cycling_speed.lookup
+    python -m cycling_speed.lookup --jarak-step 0.5 --elevasi-step 10
+"""
+import argparse
+import bisect
+import datetime
+import itertools
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+from cycling_speed import metrics
+from cycling_speed.cache import model_version
+from cycling_speed.inference import MODEL_PATH, SpeedPredictor
+
+logger = logging.getLogger(__name__)
+
+LOOKUP_PATH = os.environ.get("SPEED_LOOKUP_PATH", "./models/speed_lookup.npy")
+# Largest |table - booster| (km/h) a table may have to be served
+MAX_ERROR = float(os.environ.get("SPEED_LOOKUP_MAX_ERROR", 0.25))
+
+# Axis order of the table
+AXES = ('elevasi', 'jarak', 'curah_hujan', 'jam_tidur', 'hour', 'day_of_week')
+# Axes interpolated between grid points; the others must match a grid value
+INTERPOLATED_AXES = ('elevasi', 'jarak', 'curah_hujan', 'jam_tidur')
+
+# Rain is sampled densely near zero, where the No_Rain/Light boundary sits
+DEFAULT_RAIN_GRID = [0, 0.1, 1, 2, 5, 10, 15, 20, 30, 40, 50, 75, 100]
+
+
+def default_axes(jarak_step=2.5, elevasi_step=50, rain_grid=None):
+    """Grid values per axis; pass the slider steps (0.5, 10) for a full distance/elevation grid."""
+    return {
+        'elevasi': np.arange(50, 700 + elevasi_step / 2, elevasi_step),
+        'jarak': np.arange(5.0, 50.0 + jarak_step / 2, jarak_step),
+        'curah_hujan': np.asarray(DEFAULT_RAIN_GRID if rain_grid is None else rain_grid, dtype=np.float64),
+        'jam_tidur': np.arange(1, 13),
+        'hour': np.arange(24),
+        'day_of_week': np.arange(7),
+    }
+
+
+def _sidecar_path(path):
+    return os.path.splitext(path)[0] + '.json'
+
+
+def random_inputs(n, seed=0):
+    """``n`` random rows on the app's slider steps, one array per AXES entry."""
+    rng = np.random.default_rng(seed)
+    return [
+        rng.integers(5, 71, n) * 10.0,
+        rng.integers(10, 101, n) * 0.5,
+        rng.integers(0, 1001, n) * 0.1,
+        rng.integers(1, 13, n).astype(np.float64),
+        rng.integers(0, 24, n).astype(np.float64),
+        rng.integers(0, 7, n).astype(np.float64),
+    ]
+
+
+def measure_error(table, predictor, n=200_000, seed=0):
+    """Mean, p99 and max |table - predictor| (km/h) over ``n`` random slider inputs."""
+    inputs = random_inputs(n, seed)
+    diff = np.abs(table.predict(*inputs) - predictor.predict(*inputs))
+    return {'mean': float(diff.mean()), 'p99': float(np.percentile(diff, 99)), 'max': float(diff.max()),
+            'samples': n}
+
+
+def build_lookup_table(predictor, path=LOOKUP_PATH, axes=None, version=None, chunksize=1_000_000,
+                       max_error=MAX_ERROR):
+    """Score every grid cell with ``predictor`` and write the table to ``path``.
+
+    Writes a float32 .npy array (one dimension per AXES entry) and a JSON
+    sidecar with the axis values, model version and the table's error
+    against ``predictor`` (measure_error). The table is built under a
+    temporary name and only replaces ``path`` when its max error is within
+    ``max_error`` km/h (None accepts any); otherwise it is deleted and
+    ValueError is raised. Returns elapsed seconds.
+    """
+    axes = default_axes() if axes is None else axes
+    axes = {name: np.asarray(axes[name], dtype=np.float64) for name in AXES}
+    shape = tuple(len(axes[name]) for name in AXES)
+    start = time.perf_counter()
+
+    temp = f'{os.path.splitext(path)[0]}.{os.getpid()}.tmp.npy'
+    try:
+        table = np.lib.format.open_memmap(temp, mode='w+', dtype=np.float32, shape=shape)
+        flat = table.reshape(-1)
+        for lo in range(0, flat.size, chunksize):
+            idx = np.unravel_index(np.arange(lo, min(lo + chunksize, flat.size)), shape)
+            values = [axes[name][i] for name, i in zip(AXES, idx)]
+            flat[lo:lo + len(idx[0])] = predictor.predict(*values)
+        table.flush()
+        del flat, table
+
+        meta = {'axes': {name: axes[name].tolist() for name in AXES}, 'model_version': version}
+        with open(_sidecar_path(temp), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        meta['error'] = error = measure_error(LookupTable(temp), predictor)
+        if max_error is not None and error['max'] > max_error:
+            raise ValueError(f"Lookup table error vs the booster (mean {error['mean']:.3f}, p99 {error['p99']:.3f}, "
+                             f"max {error['max']:.3f} km/h) exceeds the {max_error} km/h tolerance; "
+                             f"{path} was not written")
+        with open(_sidecar_path(temp), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(temp, path)
+        os.replace(_sidecar_path(temp), _sidecar_path(path))
+    finally:
+        for leftover in (temp, _sidecar_path(temp)):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+    return time.perf_counter() - start
+
+
+class LookupTable:
+    """Answer predictions from a prebuilt grid without touching the booster.
+
+    Has the same predict/predict_one interface as SpeedPredictor. Inputs
+    outside the grid are clamped to its edges.
+    """
+
+    def __init__(self, path=LOOKUP_PATH, mmap_mode='r'):
+        with open(_sidecar_path(path), encoding='utf-8') as f:
+            meta = json.load(f)
+        self.model_version = meta.get('model_version')
+        # None for tables built before the error was measured
+        self.error = meta.get('error')
+        self.axes = [np.asarray(meta['axes'][name], dtype=np.float64) for name in AXES]
+        self.table = np.load(path, mmap_mode=mmap_mode)
+        if self.table.shape != tuple(len(a) for a in self.axes):
+            raise ValueError(f"Lookup table {path} does not match its axes")
+        self._flat = self.table.reshape(-1)
+        self._strides = np.array([int(np.prod(self.table.shape[i + 1:])) for i in range(len(AXES))])
+        self._interpolated = [name in INTERPOLATED_AXES for name in AXES]
+        self._axis_lists = [axis.tolist() for axis in self.axes]
+
+    @metrics.timed('lookup_predict')
+    def predict(self, elevasi, jarak, curah_hujan, jam_tidur, hour, day_of_week=None):
+        """Interpolated speeds (km/h) for one or many rows; inputs broadcast."""
+        if day_of_week is None:
+            day_of_week = datetime.date.today().weekday()
+        values = np.broadcast_arrays(*(np.atleast_1d(np.asarray(v, dtype=np.float64))
+                                       for v in (elevasi, jarak, curah_hujan, jam_tidur, hour, day_of_week)))
+
+        lower, weights = [], []
+        for axis, x, interpolated in zip(self.axes, values, self._interpolated):
+            x = np.clip(x, axis[0], axis[-1])
+            if interpolated and len(axis) > 1:
+                i = np.clip(np.searchsorted(axis, x, side='right') - 1, 0, len(axis) - 2)
+                lower.append(i)
+                weights.append((x - axis[i]) / (axis[i + 1] - axis[i]))
+            else:
+                # Nearest grid value
+                i = np.clip(np.searchsorted(axis, x), 0, len(axis) - 1)
+                prev = np.maximum(i - 1, 0)
+                lower.append(np.where(np.abs(axis[prev] - x) <= np.abs(axis[i] - x), prev, i))
+                weights.append(None)
+
+        base = sum(i * stride for i, stride in zip(lower, self._strides))
+        result = np.zeros(base.shape, dtype=np.float64)
+        dims = [d for d, w in enumerate(weights) if w is not None]
+        for corner in itertools.product((0, 1), repeat=len(dims)):
+            offset = base.copy()
+            w = np.ones(base.shape, dtype=np.float64)
+            for d, bit in zip(dims, corner):
+                if bit:
+                    offset += self._strides[d]
+                    w *= weights[d]
+                else:
+                    w *= 1 - weights[d]
+            result += w * self._flat[offset]
+        return result
+
+    @metrics.timed('lookup_predict')
+    def predict_one(self, elevasi, jarak, curah_hujan, jam_tidur, jam_mulai, tanggal=None):
+        """Predict a single ride from the app's form values (scalar path, no array overhead)."""
+        weekday = (datetime.date.today() if tanggal is None else tanggal).weekday()
+        values = (elevasi, jarak, curah_hujan, jam_tidur, jam_mulai.hour, weekday)
+
+        base = 0
+        corners = [(0, 1.0)]
+        for axis, x, stride, interpolated in zip(self._axis_lists, values, self._strides, self._interpolated):
+            x = min(max(float(x), axis[0]), axis[-1])
+            if interpolated and len(axis) > 1:
+                i = min(max(bisect.bisect_right(axis, x) - 1, 0), len(axis) - 2)
+                t = (x - axis[i]) / (axis[i + 1] - axis[i])
+                base += i * stride
+                corners = [(o + bit * stride, w * (t if bit else 1 - t)) for o, w in corners for bit in (0, 1)]
+            else:
+                i = min(range(len(axis)), key=lambda j: abs(axis[j] - x))
+                base += i * stride
+        flat = self._flat
+        return float(sum(w * float(flat[base + o]) for o, w in corners if w))
+
+
+def load_lookup_table(path=LOOKUP_PATH, model_package=None, mmap_mode='r', max_error=MAX_ERROR):
+    """Return a LookupTable for ``path``, or None if it is missing, built for another model,
+    or its measured max error exceeds ``max_error`` km/h (None accepts any table)."""
+    if not os.path.exists(path):
+        return None
+    table = LookupTable(path, mmap_mode)
+    if model_package is not None and table.model_version != model_version(model_package):
+        return None
+    if max_error is not None and (table.error is None or table.error['max'] > max_error):
+        logger.warning("Not serving lookup table %s: max error %s km/h, tolerance %s km/h", path,
+                       'unmeasured' if table.error is None else f"{table.error['max']:.3f}", max_error)
+        return None
+    return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute the prediction lookup table.")
+    parser.add_argument('--model', default=MODEL_PATH, help="joblib model package or native export")
+    parser.add_argument('--output', default=LOOKUP_PATH, help="output .npy path")
+    parser.add_argument('--jarak-step', type=float, default=2.5, help="distance grid step (slider: 0.5)")
+    parser.add_argument('--elevasi-step', type=float, default=50, help="elevation grid step (slider: 10)")
+    parser.add_argument('--rain-step', type=float, default=None,
+                        help="uniform rain grid step (slider: 0.1); default is a non-uniform grid")
+    args = parser.parse_args(argv)
+
+    from cycling_speed.export import load_package
+
+    model_package = load_package(args.model)
+    rain_grid = None if args.rain_step is None else np.round(np.arange(0, 100 + args.rain_step / 2, args.rain_step), 6)
+    axes = default_axes(args.jarak_step, args.elevasi_step, rain_grid)
+    n_cells = int(np.prod([len(v) for v in axes.values()]))
+    print(f"Scoring {n_cells:,} grid cells ({n_cells * 4 / 1e6:,.1f} MB)...")
+    try:
+        seconds = build_lookup_table(SpeedPredictor(model_package), args.output, axes, model_version(model_package))
+    except ValueError as e:
+        parser.exit(1, f"{e}\n")
+    error = LookupTable(args.output).error
+    print(f"Lookup table written to {args.output} in {seconds:.1f}s")
+    print(f"Error vs the booster on {error['samples']:,} random inputs: mean {error['mean']:.3f}, "
+          f"p99 {error['p99']:.3f}, max {error['max']:.3f} km/h (tolerance {MAX_ERROR} km/h)")
+
+
+if __name__ == '__main__':
+    main()
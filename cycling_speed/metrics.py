@@ -0,0 +1,244 @@
+"""Per-stage latency histograms for the prediction path.
+
+With CYCLING_SPEED_METRICS=1 the instrumented stages record how long each
+call takes:
+
+    model_load        loading and warming up a model package (loader.py)
+    feature_build     engineered feature matrix (SpeedPredictor)
+    scaling           StandardScaler applied to it
+    booster_predict   booster / compiled tree call
+    lookup_predict    lookup-table prediction (lookup.py)
+    scenario_predict  the Speed Comparison scenarios (pages/prediksi.py)
+    figure_build      Plotly figure construction
+    chart_render      st.plotly_chart (serializing the figure)
+    render            prediction card and mini cards
+    request           one run of the prediction fragment (a form submit)
+    service_predict   one POST /predict of the HTTP service (service.py)
+
+Durations go into fixed-bucket histograms (10 us to 10 s, as Prometheus
+histograms), dumped by prometheus_text() in the Prometheus text format or
+by to_json() with estimated p50/p99. The HTTP service serves them on GET
+/metrics; the app sidebar offers both dumps for download. When disabled
+(the default) timer() returns one shared no-op context manager.
+
+    CYCLING_SPEED_METRICS=1 streamlit run home.py
+    python -m cycling_speed.metrics --repeat 2000      # timer overhead and a sample dump
+"""
+import argparse
+import bisect
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+ENABLED = os.environ.get("CYCLING_SPEED_METRICS", "0") not in ("", "0")
+
+# Upper bounds (seconds) of the histogram buckets; a last +Inf bucket catches the rest
+BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRIC_NAME = 'cycling_speed_stage_seconds'
+
+
+class Histogram:
+    """Cumulative latency histogram over ``buckets`` (seconds)."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def quantile(self, q):
+        """Estimated ``q`` quantile in seconds, interpolated within its bucket (None when empty)."""
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = min(self.buckets[i] if i < len(self.buckets) else self.max, self.max)
+                return lower + (max(upper, lower) - lower) * (rank - seen) / n
+            seen += n
+        return None
+
+
+_histograms = {}
+_lock = threading.Lock()
+
+
+def histogram(stage):
+    """The Histogram of ``stage`` (created on first use)."""
+    found = _histograms.get(stage)
+    if found is None:
+        with _lock:
+            found = _histograms.setdefault(stage, Histogram())
+    return found
+
+
+def observe(stage, seconds):
+    """Record a duration measured elsewhere."""
+    if ENABLED:
+        histogram(stage).observe(seconds)
+
+
+class _Timer:
+    __slots__ = ('stage', 'start')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        histogram(self.stage).observe(time.perf_counter() - self.start)
+
+
+_NULL_TIMER = contextlib.nullcontext()
+
+
+def timer(stage):
+    """Context manager recording the duration of its block under ``stage``."""
+    return _Timer(stage) if ENABLED else _NULL_TIMER
+
+
+def timed(stage):
+    """Decorator form of timer()."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def set_enabled(enabled=True):
+    global ENABLED
+    ENABLED = bool(enabled)
+
+
+def reset(stage=None):
+    """Drop the histogram of ``stage``, or all of them."""
+    with _lock:
+        if stage is None:
+            _histograms.clear()
+        else:
+            _histograms.pop(stage, None)
+
+
+def snapshot():
+    """Per stage: count, total seconds and mean/p50/p99/max in milliseconds."""
+    stats = {}
+    for stage, h in sorted(_histograms.items()):
+        if h.count:
+            stats[stage] = {'count': h.count, 'sum_s': h.sum, 'mean_ms': h.sum / h.count * 1000,
+                            'p50_ms': h.quantile(0.5) * 1000, 'p99_ms': h.quantile(0.99) * 1000,
+                            'max_ms': h.max * 1000}
+    return stats
+
+
+def report():
+    return {'enabled': ENABLED, 'stages': snapshot()}
+
+
+def to_json():
+    return json.dumps(report(), indent=1)
+
+
+def prometheus_text():
+    """All histograms in the Prometheus text exposition format."""
+    lines = [f"# HELP {METRIC_NAME} Duration of prediction path stages.", f"# TYPE {METRIC_NAME} histogram"]
+    for stage, h in sorted(_histograms.items()):
+        with h._lock:
+            counts, total, count = list(h.counts), h.sum, h.count
+        cumulative = 0
+        for bound, n in zip([*map(repr, h.buckets), '+Inf'], counts):
+            cumulative += n
+            lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+        lines.append(f'{METRIC_NAME}_sum{{stage="{stage}"}} {total!r}')
+        lines.append(f'{METRIC_NAME}_count{{stage="{stage}"}} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def write_metrics(path):
+    """Dump to ``path``: Prometheus text for .prom/.txt, JSON otherwise."""
+    text = prometheus_text() if path.endswith(('.prom', '.txt')) else to_json()
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def format_table(stats):
+    rows = [f"{'stage':<17} {'count':>7} {'mean ms':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}"]
+    for stage, s in stats.items():
+        rows.append(f"{stage:<17} {s['count']:>7} {s['mean_ms']:>9.3f} {s['p50_ms']:>8.3f} "
+                    f"{s['p99_ms']:>8.3f} {s['max_ms']:>8.3f}")
+    return '\n'.join(rows)
+
+
+def main(argv=None):
+    import datetime
+
+    import numpy as np
+
+    # Under ``python -m`` this file is __main__; the instrumented modules use the package module
+    from cycling_speed import metrics
+    from cycling_speed.loader import ModelLoader
+    from cycling_speed.registry import default_model_path
+    from cycling_speed.scenarios import predict_scenarios
+
+    parser = argparse.ArgumentParser(description="Time the instrumented prediction path and dump the histograms.")
+    parser.add_argument('--model', default=None, help="package, export or registry (default: as served)")
+    parser.add_argument('--repeat', type=int, default=2000, help="single predictions to time")
+    parser.add_argument('--output', default=None, help="write the dump here (.prom for Prometheus text, else JSON)")
+    args = parser.parse_args(argv)
+
+    metrics.set_enabled(True)
+    loader = ModelLoader(default_model_path() if args.model is None else args.model)
+    loader.wait()
+    if loader.predictor is None:
+        parser.exit(1, f"Model failed to load: {loader.error!r}\n")
+    predictor = loader.predictor
+    rng = np.random.default_rng(0)
+    rides = [(float(rng.uniform(50, 700)), float(rng.uniform(5, 50)), float(rng.choice([0, 5, 20])),
+              int(rng.integers(1, 12)), datetime.time(int(rng.integers(5, 19)))) for _ in range(args.repeat)]
+
+    for ride in rides:
+        predictor.predict_one(*ride)
+    # Overhead of one timed block, off and on (a booster prediction has three)
+    overhead = {}
+    for enabled in (False, True):
+        metrics.set_enabled(enabled)
+        start = time.perf_counter()
+        for _ in range(100_000):
+            with metrics.timer('overhead'):
+                pass
+        overhead[enabled] = (time.perf_counter() - start) / 100_000 * 1e6
+    metrics.reset('overhead')
+    metrics.set_enabled(True)
+    for elevasi, jarak, curah_hujan, jam_tidur, jam_mulai in rides[:200]:
+        with metrics.timer('scenario_predict'):
+            predict_scenarios(predictor.predict, {'elevasi': elevasi, 'jarak': jarak, 'curah_hujan': curah_hujan,
+                                                  'jam_tidur': jam_tidur, 'hour': jam_mulai.hour})
+
+    print(format_table(metrics.snapshot()))
+    print(f"Timer overhead per block: {overhead[False]:.2f} us disabled, {overhead[True]:.2f} us enabled")
+    if args.output:
+        metrics.write_metrics(args.output)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""Local model registry: versioned packages and a manifest naming the live one.
+
+Layout under REGISTRY_DIR::
+
+    manifest.json          {'current': 3, 'versions': [entry, ...]}
+    v1/cycling_speed_prediction_model_v2.joblib
+    v3/cycling_speed_prediction_model_v2.ubj (+ .meta.json sidecar)
+
+Each entry records the version, artifact file, its SHA-256, the package's
+model_performance and training_info, and the feature schema (columns and
+category labels). register() copies a package in as a new version;
+promote() points 'current' at a version by atomically replacing the
+manifest. The app's RegistryLoader (loader.py) polls the manifest and
+hot-swaps the served model when 'current' changes.
+
+    python -m cycling_speed.registry register models/cycling_speed_prediction_model_v2.joblib --promote
+    python -m cycling_speed.registry promote 2
+    python -m cycling_speed.registry list
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime
+
+from cycling_speed.inference import MODEL_PATH
+
+REGISTRY_DIR = os.environ.get("MODEL_REGISTRY_DIR", "./models/registry")
+MANIFEST_NAME = 'manifest.json'
+
+
+def manifest_path(registry_dir=REGISTRY_DIR):
+    return os.path.join(registry_dir, MANIFEST_NAME)
+
+
+def has_registry(registry_dir=REGISTRY_DIR):
+    return os.path.exists(manifest_path(registry_dir))
+
+
+def read_manifest(registry_dir=REGISTRY_DIR):
+    """The registry manifest (an empty one if the registry doesn't exist yet)."""
+    try:
+        with open(manifest_path(registry_dir), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'current': None, 'versions': []}
+
+
+def _write_manifest(manifest, registry_dir):
+    # Readers see either the old or the new manifest, never a partial one
+    tmp = manifest_path(registry_dir) + f'.{os.getpid()}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, manifest_path(registry_dir))
+
+
+def _sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def get_entry(version, registry_dir=REGISTRY_DIR, manifest=None):
+    """Manifest entry of ``version``; raises ValueError if it isn't registered."""
+    manifest = manifest or read_manifest(registry_dir)
+    for entry in manifest['versions']:
+        if entry['version'] == int(version):
+            return entry
+    raise ValueError(f"Version {version} is not in the registry {registry_dir}")
+
+
+def current_entry(registry_dir=REGISTRY_DIR):
+    """Entry of the promoted version, or None when nothing is promoted."""
+    manifest = read_manifest(registry_dir)
+    if manifest['current'] is None:
+        return None
+    return get_entry(manifest['current'], registry_dir, manifest)
+
+
+def artifact_path(entry, registry_dir=REGISTRY_DIR):
+    return os.path.join(registry_dir, f"v{entry['version']}", entry['file'])
+
+
+def verify(entry, registry_dir=REGISTRY_DIR):
+    """Path of the entry's artifact after checking its SHA-256; raises ValueError on a mismatch."""
+    path = artifact_path(entry, registry_dir)
+    if _sha256(path) != entry['sha256']:
+        raise ValueError(f"{path} does not match the registry hash of version {entry['version']}")
+    return path
+
+
+def register(path, registry_dir=REGISTRY_DIR, promote=False, note=None):
+    """Copy the package at ``path`` (and its sidecar) into the registry as a new version.
+
+    Returns the new manifest entry; with ``promote`` it also becomes current.
+    """
+    from cycling_speed.export import is_native_path, load_package, package_metadata, sidecar_path
+
+    metadata = package_metadata(load_package(path))
+    os.makedirs(registry_dir, exist_ok=True)
+    versions = [entry['version'] for entry in read_manifest(registry_dir)['versions']]
+    version = max(versions, default=0) + 1
+    while True:
+        # mkdir claims the version even if another process registers concurrently
+        try:
+            os.mkdir(os.path.join(registry_dir, f'v{version}'))
+            break
+        except FileExistsError:
+            version += 1
+    target = os.path.join(registry_dir, f'v{version}', os.path.basename(path))
+    shutil.copyfile(path, target)
+    if is_native_path(path):
+        shutil.copyfile(sidecar_path(path), sidecar_path(target))
+
+    entry = {
+        'version': version,
+        'file': os.path.basename(path),
+        'sha256': _sha256(target),
+        'registered': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'source': os.path.abspath(path),
+        'note': note,
+        'model_performance': metadata['model_performance'],
+        'training_info': metadata['training_info'],
+        'schema': {'feature_columns': metadata['feature_columns'], 'encoder_classes': metadata['encoder_classes']},
+    }
+    # Re-read so entries registered meanwhile are kept
+    manifest = read_manifest(registry_dir)
+    manifest['versions'] = sorted(manifest['versions'] + [entry], key=lambda e: e['version'])
+    if promote:
+        manifest['current'] = version
+    _write_manifest(manifest, registry_dir)
+    return entry
+
+
+def promote(version, registry_dir=REGISTRY_DIR):
+    """Make ``version`` the one served (after checking its hash); returns its entry."""
+    manifest = read_manifest(registry_dir)
+    entry = get_entry(version, registry_dir, manifest)
+    verify(entry, registry_dir)
+    manifest['current'] = entry['version']
+    _write_manifest(manifest, registry_dir)
+    return entry
+
+
+def default_model_path(registry_dir=REGISTRY_DIR):
+    """What the app serves: the registry if one exists, else MODEL_PATH."""
+    return registry_dir if has_registry(registry_dir) else MODEL_PATH
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the local model registry.")
+    parser.add_argument('--registry', default=REGISTRY_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    register_parser = commands.add_parser('register', help="add a model package as a new version")
+    register_parser.add_argument('path', nargs='?', default=MODEL_PATH)
+    register_parser.add_argument('--promote', action='store_true', help="also make it the served version")
+    register_parser.add_argument('--note', default=None)
+    promote_parser = commands.add_parser('promote', help="serve a registered version")
+    promote_parser.add_argument('version', type=int)
+    commands.add_parser('list', help="show registered versions")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'register':
+            entry = register(args.path, args.registry, args.promote, args.note)
+            print(f"Registered {args.path} as v{entry['version']}{' (current)' if args.promote else ''}")
+        elif args.command == 'promote':
+            entry = promote(args.version, args.registry)
+            print(f"v{entry['version']} is now current")
+        else:
+            manifest = read_manifest(args.registry)
+            for entry in manifest['versions']:
+                mae = entry['model_performance'].get('test_mae')
+                print(f"{'*' if entry['version'] == manifest['current'] else ' '} v{entry['version']:<4} "
+                      f"{entry['file']:<45} trained {entry['training_info'].get('training_date', '?'):<20} "
+                      f"MAE {'-' if mae is None else f'{mae:.3f}'}")
+    except ValueError as e:
+        parser.exit(1, f"{e}\n")
+
+
+if __name__ == '__main__':
+    main()
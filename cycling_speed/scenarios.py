@@ -0,0 +1,48 @@
+"""What-if scenarios expressed as input rows and predicted in one batch."""
+import json
+
+import numpy as np
+
+# Column order of a scenario input row
+INPUT_FIELDS = ('elevasi', 'jarak', 'curah_hujan', 'jam_tidur', 'hour')
+
+# (name, overrides applied to the rider's own inputs)
+DEFAULT_SCENARIOS = [
+    ('Perfect Conditions', {'elevasi': 100, 'curah_hujan': 0, 'jam_tidur': 8, 'hour': 6}),
+    ('Rainy Conditions', {'curah_hujan': 20}),
+    ('Hilly Terrain', {'elevasi': 400}),
+    ('Tired Rider', {'jam_tidur': 3}),
+]
+
+
+def load_scenarios(path):
+    """Read scenarios from a JSON file: a list of {"name": ..., "overrides": {...}}."""
+    with open(path, encoding='utf-8') as f:
+        entries = json.load(f)
+    scenarios = [(entry['name'], dict(entry.get('overrides', {}))) for entry in entries]
+    for name, overrides in scenarios:
+        unknown = set(overrides) - set(INPUT_FIELDS)
+        if unknown:
+            raise ValueError(f"Scenario {name!r} overrides unknown inputs: {sorted(unknown)}")
+    return scenarios
+
+
+def scenario_matrix(base, scenarios=DEFAULT_SCENARIOS):
+    """Return an (n_scenarios, len(INPUT_FIELDS)) array: the base row with each scenario applied."""
+    rows = np.tile(np.array([base[field] for field in INPUT_FIELDS], dtype=np.float64), (len(scenarios), 1))
+    for i, (_, overrides) in enumerate(scenarios):
+        for field, value in overrides.items():
+            rows[i, INPUT_FIELDS.index(field)] = value
+    return rows
+
+
+def predict_scenarios(predict, base, scenarios=DEFAULT_SCENARIOS):
+    """Predict every scenario with a single vectorized call.
+
+    ``predict(elevasi, jarak, curah_hujan, jam_tidur, hour)`` takes one array per
+    input and returns one speed per row. Returns a list of (name, speed).
+    """
+    if not scenarios:
+        return []
+    speeds = predict(*scenario_matrix(base, scenarios).T)
+    return [(name, float(speed)) for (name, _), speed in zip(scenarios, speeds)]
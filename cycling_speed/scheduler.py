@@ -0,0 +1,142 @@
+"""Split CPU cores between parallel fits and XGBoost's own threads.
+
+Wrapping an ``n_jobs=-1`` booster in an ``n_jobs=-1`` search starts
+cores x cores threads. CpuScheduler instead picks ``outer`` concurrent
+fits with ``inner`` booster threads each so that outer x inner never
+exceeds the cores available, and runs the fits in a thread pool (XGBoost
+releases the GIL while training).
+
+Policies: 'inner' (one fit at a time, all threads to the booster), 'outer'
+(one thread per fit, as many fits as cores), 'balanced' (about sqrt(cores)
+of each), or an explicit 'OUTERxINNER' such as '4x2'. An explicit split
+is capped to the cores like the others ('8x8' on 4 cores runs 4x1, with a
+warning); only the benchmark oversubscribes on purpose. The default comes
+from CYCLING_SPEED_THREAD_POLICY.
+
+    python -m cycling_speed.scheduler --cpus 8   # fits/second per split
+"""
+import argparse
+import logging
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+THREAD_POLICY = os.environ.get("CYCLING_SPEED_THREAD_POLICY", "balanced")
+POLICIES = ('inner', 'outer', 'balanced')
+
+
+def available_cpus():
+    """Cores this process may run on (respects affinity/cgroup pinning where the OS reports it)."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def split_cpus(n_tasks, n_cpus=None, policy=THREAD_POLICY, oversubscribe=False):
+    """Return ``(outer, inner)`` for ``n_tasks`` independent fits on ``n_cpus`` cores.
+
+    An explicit 'OUTERxINNER' policy is reduced to fit ``n_cpus`` unless
+    ``oversubscribe`` is set.
+    """
+    n_cpus = available_cpus() if n_cpus is None else max(1, int(n_cpus))
+    n_tasks = max(1, int(n_tasks))
+    if 'x' in str(policy):
+        try:
+            outer, inner = (max(1, int(v)) for v in str(policy).split('x'))
+        except ValueError:
+            raise ValueError(f"Unknown thread policy {policy!r}; use one of {POLICIES} or 'OUTERxINNER'") from None
+        outer = min(outer, n_tasks)
+        if outer * inner > n_cpus and not oversubscribe:
+            capped = min(outer, n_cpus), max(1, n_cpus // min(outer, n_cpus))
+            logger.warning("Thread policy %r needs %d threads on %d cores; using %dx%d", policy, outer * inner,
+                           n_cpus, *capped)
+            outer, inner = capped
+        return outer, inner
+    if policy == 'inner':
+        return 1, n_cpus
+    if policy == 'outer':
+        outer = min(n_tasks, n_cpus)
+    elif policy == 'balanced':
+        outer = min(n_tasks, max(1, n_cpus // max(1, round(math.sqrt(n_cpus)))))
+    else:
+        raise ValueError(f"Unknown thread policy {policy!r}; use one of {POLICIES} or 'OUTERxINNER'")
+    return outer, max(1, n_cpus // outer)
+
+
+class CpuScheduler:
+    """Run independent fits concurrently with a bounded number of threads in total.
+
+    ``map(fn, tasks)`` calls ``fn(task, nthread)`` for every task, ``outer``
+    at a time, and returns the results in task order.
+    """
+
+    def __init__(self, n_cpus=None, policy=THREAD_POLICY, oversubscribe=False):
+        self.n_cpus = available_cpus() if n_cpus is None else n_cpus
+        self.policy = policy
+        self.oversubscribe = oversubscribe
+
+    def split(self, n_tasks):
+        return split_cpus(n_tasks, self.n_cpus, self.policy, self.oversubscribe)
+
+    def map(self, fn, tasks):
+        tasks = list(tasks)
+        if not tasks:
+            return []
+        outer, inner = self.split(len(tasks))
+        if outer == 1:
+            return [fn(task, inner) for task in tasks]
+        with ThreadPoolExecutor(max_workers=outer, thread_name_prefix='fit') as pool:
+            return list(pool.map(lambda task: fn(task, inner), tasks))
+
+
+def benchmark(n_cpus=None, n_fits=16, n_rows=20_000, n_features=18, rounds=100, splits=None, seed=0):
+    """Fits per second for each (outer, inner) split of ``n_cpus`` cores."""
+    import xgboost as xgb
+
+    n_cpus = available_cpus() if n_cpus is None else n_cpus
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, n_features)).astype(np.float32)
+    y = (X[:, 0] * 3 + X[:, 1] ** 2 + rng.normal(size=n_rows)).astype(np.float32)
+    if splits is None:
+        splits = sorted({(o, n_cpus // o) for o in range(1, n_cpus + 1) if n_cpus % o == 0})
+        splits.append((n_cpus, n_cpus))  # oversubscribed: n_jobs=-1 inside n_jobs=-1
+    params = {'objective': 'reg:squarederror', 'max_depth': 5, 'learning_rate': 0.1, 'tree_method': 'hist'}
+
+    def fit(task, nthread):
+        dtrain = xgb.DMatrix(X, label=y, nthread=nthread)
+        xgb.train({**params, 'nthread': nthread, 'seed': task}, dtrain, num_boost_round=rounds)
+
+    results = []
+    for outer, inner in splits:
+        # Runs every split as given, including the oversubscribed baseline
+        scheduler = CpuScheduler(n_cpus, f'{outer}x{inner}', oversubscribe=True)
+        start = time.perf_counter()
+        scheduler.map(fit, range(n_fits))
+        elapsed = time.perf_counter() - start
+        results.append({'outer': outer, 'inner': inner, 'seconds': elapsed, 'fits_per_s': n_fits / elapsed})
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark outer/inner thread splits for XGBoost fits.")
+    parser.add_argument('--cpus', type=int, default=None, help="core count to split (default: available)")
+    parser.add_argument('--fits', type=int, default=16)
+    parser.add_argument('--rows', type=int, default=20_000)
+    parser.add_argument('--rounds', type=int, default=100)
+    args = parser.parse_args(argv)
+
+    n_cpus = available_cpus() if args.cpus is None else args.cpus
+    print(f"{args.fits} fits x {args.rounds} rounds on {args.rows:,} rows, {n_cpus} cores "
+          f"(policy {THREAD_POLICY!r} -> {split_cpus(args.fits, n_cpus)})")
+    print(f"{'outer':>6} {'inner':>6} {'seconds':>9} {'fits/s':>8}")
+    for row in benchmark(n_cpus, args.fits, args.rows, rounds=args.rounds):
+        print(f"{row['outer']:>6} {row['inner']:>6} {row['seconds']:>9.2f} {row['fits_per_s']:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
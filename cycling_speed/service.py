@@ -0,0 +1,438 @@
+"""HTTP prediction service for clients other than the Streamlit page.
+
+A small asyncio HTTP/1.1 server (standard library only) in front of the
+same model loader as the app (loader.get_loader, so a registry hot-swap
+applies here too):
+
+    POST /predict  {"elevasi": 200, "jarak": 25, "curah_hujan": 0, "jam_tidur": 7, "jam_mulai": "06:00"}
+                   -> {"speed": 21.4}
+    POST /predict  [{...}, {...}]  -> {"speeds": [21.4, 18.9]}
+    GET  /health   -> readiness, model path and batching counters
+    GET  /metrics  -> stage latency histograms, Prometheus text (?format=json for JSON; see metrics.py)
+
+A ride may give ``hour`` instead of ``jam_mulai`` and an optional
+``day_of_week`` (Monday=0, default today). Values outside the form's
+slider ranges (FIELD_RANGES) are rejected with 400. Concurrent single-ride
+requests are coalesced by a MicroBatcher: a batch is sent to a booster
+call when it reaches ``max_batch_size`` rides or ``max_wait_ms`` after its
+first ride. JSON arrays are predicted in one call as they are. Booster
+calls run in a thread pool, so the event loop keeps accepting requests.
+
+    python -m cycling_speed.service serve --port 8502
+    python -m cycling_speed.service loadtest --concurrency 32 --requests 4000
+    python -m cycling_speed.service loadtest --url http://127.0.0.1:8502   # against a running server
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from cycling_speed import metrics
+from cycling_speed.loader import get_loader
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = int(os.environ.get("PREDICT_MAX_BATCH_SIZE", 64))
+MAX_WAIT_MS = float(os.environ.get("PREDICT_MAX_WAIT_MS", 2))
+# Threads for booster calls; each call already uses the booster's own threads
+PREDICT_WORKERS = int(os.environ.get("PREDICT_WORKERS", 2))
+MAX_BODY_BYTES = 1 << 20
+
+INPUT_FIELDS = ('elevasi', 'jarak', 'curah_hujan', 'jam_tidur')
+# Accepted values (inclusive), as on the prediction form's sliders; the model was not trained beyond them
+FIELD_RANGES = {
+    'elevasi': (50, 700),
+    'jarak': (5, 50),
+    'curah_hujan': (0, 100),
+    'jam_tidur': (1, 12),
+    'hour': (0, 23),
+    'day_of_week': (0, 6),
+}
+
+
+class HTTPError(Exception):
+    """Error answered with ``status`` and a JSON ``{'error': message}`` body."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _start_hour(jam_mulai):
+    """Hour of a 'HH:MM' (or 'HH:MM:SS') start time."""
+    parts = str(jam_mulai).split(':')
+    if not 2 <= len(parts) <= 3 or not all(part.isdigit() for part in parts):
+        raise ValueError(f"jam_mulai must be 'HH:MM', got {jam_mulai!r}")
+    hour, minute = int(parts[0]), int(parts[1])
+    if hour > 23 or minute > 59 or (len(parts) == 3 and int(parts[2]) > 59):
+        raise ValueError(f"jam_mulai must be a time of day 00:00-23:59, got {jam_mulai!r}")
+    return float(hour)
+
+
+def parse_ride(ride):
+    """Model inputs of one ride object as ``[elevasi, jarak, curah_hujan, jam_tidur, hour, day_of_week]``.
+
+    Raises ValueError for missing fields, non-numbers and values outside FIELD_RANGES.
+    """
+    if not isinstance(ride, dict):
+        raise ValueError("Each ride must be a JSON object")
+    missing = [name for name in INPUT_FIELDS if name not in ride]
+    if 'hour' not in ride and 'jam_mulai' not in ride:
+        missing.append('jam_mulai')
+    if missing:
+        raise ValueError(f"Missing fields: {', '.join(missing)}")
+    values = {name: ride[name] for name in INPUT_FIELDS}
+    if 'hour' in ride:
+        values['hour'] = ride['hour']
+    day_of_week = ride.get('day_of_week')
+    values['day_of_week'] = datetime.date.today().weekday() if day_of_week is None else day_of_week
+    for name, value in values.items():
+        # bool is an int subclass, and float() would also accept strings like "nan"
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"{name} must be a number, got {value!r}")
+        low, high = FIELD_RANGES[name]
+        if not low <= value <= high:
+            raise ValueError(f"{name} must be between {low} and {high}, got {value!r}")
+    if values['day_of_week'] != int(values['day_of_week']):
+        raise ValueError(f"day_of_week must be a whole number, got {values['day_of_week']!r}")
+    hour = float(values['hour']) if 'hour' in values else _start_hour(ride['jam_mulai'])
+    return [float(values[name]) for name in INPUT_FIELDS] + [hour, float(values['day_of_week'])]
+
+
+class MicroBatcher:
+    """Coalesce single rows submitted concurrently into one ``predict(rows)`` call.
+
+    ``predict`` runs in ``executor`` and returns one result per row. A batch
+    is flushed when it holds ``max_batch_size`` rows or ``max_wait`` seconds
+    after its first row; ``max_batch_size=1`` predicts every row alone.
+    """
+
+    def __init__(self, predict, executor, max_batch_size=MAX_BATCH_SIZE, max_wait=MAX_WAIT_MS / 1000):
+        self.predict = predict
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait
+        self.batches = 0
+        self.rows = 0
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+    async def submit(self, row):
+        """Result for ``row`` once its batch is predicted."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((row, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run(batch))
+            # The loop only keeps weak references to tasks
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        self.batches += 1
+        self.rows += len(batch)
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.predict, [row for row, _ in batch])
+        except Exception as e:
+            results, error = None, e
+        for i, (_, future) in enumerate(batch):
+            # A client that disconnected has cancelled its future
+            if not future.done():
+                if results is None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(results[i])
+
+
+class PredictionService:
+    """The /predict and /health endpoints over a model loader."""
+
+    def __init__(self, loader=None, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS, workers=PREDICT_WORKERS):
+        self.loader = get_loader() if loader is None else loader
+        self.executor = ThreadPoolExecutor(max(1, workers), thread_name_prefix='predict')
+        self.batcher = MicroBatcher(self.predict_rows, self.executor, max_batch_size, max_wait_ms / 1000)
+        self.requests = 0
+
+    def predict_rows(self, rows):
+        """Speeds (km/h) for rows from parse_ride(); called in the thread pool."""
+        _, predictor = self.loader.snapshot()
+        if predictor is None:
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, f"Model not available: {self.loader.error!r}")
+        inputs = np.asarray(rows, dtype=np.float64)
+        return predictor.predict(*inputs[:, :5].T, inputs[:, 5]).tolist()
+
+    async def predict(self, payload):
+        try:
+            rows = [parse_ride(ride) for ride in payload] if isinstance(payload, list) else parse_ride(payload)
+        except ValueError as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, str(e)) from None
+        if not self.loader.ready:
+            await asyncio.get_running_loop().run_in_executor(None, self.loader.wait)
+        if not isinstance(payload, list):
+            return {'speed': await self.batcher.submit(rows)}
+        # An explicit batch is already one booster call
+        speeds = await asyncio.get_running_loop().run_in_executor(self.executor, self.predict_rows, rows) if rows else []
+        return {'speeds': speeds}
+
+    def health(self):
+        entry = getattr(self.loader, 'entry', None)
+        return {
+            'ready': self.loader.ready and self.loader.predictor is not None,
+            'model': self.loader.path,
+            'version': None if entry is None else entry['version'],
+            'requests': self.requests,
+            'batches': self.batcher.batches,
+            'batched_rows': self.batcher.rows,
+        }
+
+    async def dispatch(self, method, path, body):
+        """``(status, payload)`` for one request."""
+        url = urlsplit(path)
+        path = url.path
+        if path == '/metrics':
+            if method != 'GET':
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Use GET /metrics")
+            return HTTPStatus.OK, metrics.report() if 'format=json' in url.query else metrics.prometheus_text()
+        if path == '/health':
+            if method != 'GET':
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Use GET /health")
+            return HTTPStatus.OK, self.health()
+        if path == '/predict':
+            if method != 'POST':
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Use POST /predict")
+            try:
+                payload = json.loads(body)
+            except (UnicodeDecodeError, json.JSONDecodeError) as e:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, f"Invalid JSON: {e}") from None
+            with metrics.timer('service_predict'):
+                return HTTPStatus.OK, await self.predict(payload)
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"No endpoint {path}")
+
+    async def handle_connection(self, reader, writer):
+        """Serve HTTP/1.1 requests on one (keep-alive) connection."""
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    request = await read_request(reader)
+                    if request is None:
+                        break
+                    method, path, headers, body = request
+                    keep_alive = headers.get('connection', '').lower() != 'close'
+                    self.requests += 1
+                    status, payload = await self.dispatch(method, path, body)
+                except HTTPError as e:
+                    status, payload = e.status, {'error': str(e)}
+                except Exception:
+                    logger.exception("Prediction request failed")
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': "Internal error"}
+                writer.write(encode_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=8502):
+        """Start loading the model and listening; returns the asyncio server."""
+        self.loader.start()
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+async def read_request(reader):
+    """``(method, path, headers, body)`` of the next request, or None at end of stream."""
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    try:
+        method, path, _ = line.decode('latin-1').split()
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line") from None
+    headers = await _read_headers(reader)
+    length = content_length(headers)
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Body over {MAX_BODY_BYTES} bytes")
+    return method.upper(), path, headers, await reader.readexactly(length) if length else b''
+
+
+def content_length(headers):
+    """Body size from the Content-Length header (0 when absent); 400 unless it is a non-negative integer."""
+    value = headers.get('content-length', '')
+    if not value:
+        return 0
+    # isascii: str.isdigit also accepts digits such as '²' that int() rejects
+    if not (value.isascii() and value.isdigit()):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"Invalid Content-Length: {value!r}")
+    return int(value)
+
+
+async def _read_headers(reader):
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            return headers
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+
+def encode_response(status, payload, keep_alive=True):
+    """Response bytes; ``payload`` is sent as JSON, or as plain text when it is a str."""
+    if isinstance(payload, str):
+        body, content_type = payload.encode(), 'text/plain; version=0.0.4; charset=utf-8'
+    else:
+        body, content_type = json.dumps(payload, separators=(',', ':')).encode(), 'application/json'
+    status = HTTPStatus(status)
+    return (f"HTTP/1.1 {status.value} {status.phrase}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+            ).encode() + body
+
+
+async def serve(host='127.0.0.1', port=8502, **service_params):
+    service = PredictionService(**service_params)
+    server = await service.start(host, port)
+    logger.info("Serving predictions on http://%s:%d", host, port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def _request_bodies(n, rides_per_request, seed):
+    rng = np.random.default_rng(seed)
+    bodies = []
+    for _ in range(n):
+        rides = [{'elevasi': round(float(rng.uniform(50, 700))), 'jarak': round(float(rng.uniform(10, 50)), 1),
+                  'curah_hujan': round(float(rng.choice([0, 0, 5, 20, 60]))), 'jam_tidur': int(rng.integers(4, 10)),
+                  'jam_mulai': f"{int(rng.integers(5, 19)):02d}:00"} for _ in range(rides_per_request)]
+        bodies.append(json.dumps(rides if rides_per_request > 1 else rides[0]).encode())
+    return bodies
+
+
+async def _client(host, port, bodies, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for body in bodies:
+            start = time.perf_counter()
+            writer.write(f"POST /predict HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+            await writer.drain()
+            status = int((await reader.readline()).split()[1])
+            headers = await _read_headers(reader)
+            response = await reader.readexactly(int(headers['content-length']))
+            if status != HTTPStatus.OK:
+                raise RuntimeError(f"HTTP {status}: {response.decode()}")
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+async def load_test(host, port, concurrency=32, requests=4000, rides_per_request=1, seed=0):
+    """Send ``requests`` POST /predict from ``concurrency`` keep-alive clients; returns latency stats."""
+    bodies = _request_bodies(requests, rides_per_request, seed)
+    latencies = []
+    # Warm the connection path and the model before timing
+    await _client(host, port, bodies[:1], [])
+    start = time.perf_counter()
+    await asyncio.gather(*(_client(host, port, bodies[i::concurrency], latencies) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    return {'requests': len(latencies), 'seconds': elapsed, 'requests_per_s': len(latencies) / elapsed,
+            'rides_per_s': len(latencies) * rides_per_request / elapsed, 'p50_ms': p50, 'p99_ms': p99}
+
+
+async def local_load_test(batch_sizes=(1, MAX_BATCH_SIZE), max_wait_ms=MAX_WAIT_MS, workers=PREDICT_WORKERS,
+                          model=None, **load_params):
+    """load_test() against an in-process server per ``max_batch_size``; the client shares its CPU."""
+    loader = get_loader(model)
+    results = []
+    for max_batch_size in batch_sizes:
+        service = PredictionService(loader, max_batch_size, max_wait_ms, workers)
+        server = await service.start('127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            stats = await load_test('127.0.0.1', port, **load_params)
+        finally:
+            server.close()
+            await server.wait_closed()
+            service.close()
+        results.append({'max_batch_size': max_batch_size, **stats,
+                        # Array requests bypass the batcher
+                        'mean_batch': service.batcher.rows / service.batcher.batches if service.batcher.batches else None})
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve predictions over HTTP, or load-test the service.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve_parser = commands.add_parser('serve', help="run the HTTP service")
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8502)
+    test_parser = commands.add_parser('loadtest', help="measure p50/p99 latency and throughput")
+    test_parser.add_argument('--url', default=None, help="running service (default: in-process servers)")
+    test_parser.add_argument('--batch-sizes', default=f"1,{MAX_BATCH_SIZE}",
+                             help="comma-separated max batch sizes for the in-process servers")
+    test_parser.add_argument('--concurrency', type=int, default=32)
+    test_parser.add_argument('--requests', type=int, default=4000)
+    test_parser.add_argument('--rides-per-request', type=int, default=1)
+    serve_parser.add_argument('--max-batch-size', type=int, default=MAX_BATCH_SIZE)
+    for command in (serve_parser, test_parser):
+        command.add_argument('--model', default=None, help="package, export or registry (default: as served)")
+        command.add_argument('--max-wait-ms', type=float, default=MAX_WAIT_MS)
+        command.add_argument('--workers', type=int, default=PREDICT_WORKERS)
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(message)s')
+        try:
+            asyncio.run(serve(args.host, args.port, loader=get_loader(args.model), max_batch_size=args.max_batch_size,
+                              max_wait_ms=args.max_wait_ms, workers=args.workers))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    load_params = dict(concurrency=args.concurrency, requests=args.requests, rides_per_request=args.rides_per_request)
+    print(f"{args.requests:,} requests x {args.rides_per_request} rides, {args.concurrency} concurrent clients")
+    print(f"{'max batch':>9} {'mean batch':>10} {'req/s':>8} {'rides/s':>9} {'p50 ms':>7} {'p99 ms':>7}")
+    if args.url:
+        url = urlsplit(args.url)
+        stats = asyncio.run(load_test(url.hostname, url.port or 80, **load_params))
+        print(f"{'-':>9} {'-':>10} {stats['requests_per_s']:>8.0f} {stats['rides_per_s']:>9.0f} "
+              f"{stats['p50_ms']:>7.2f} {stats['p99_ms']:>7.2f}")
+        return
+    batch_sizes = [int(size) for size in args.batch_sizes.split(',')]
+    for row in asyncio.run(local_load_test(batch_sizes, args.max_wait_ms, args.workers, args.model, **load_params)):
+        mean_batch = '-' if row['mean_batch'] is None else f"{row['mean_batch']:.1f}"
+        print(f"{row['max_batch_size']:>9} {mean_batch:>10} {row['requests_per_s']:>8.0f} "
+              f"{row['rides_per_s']:>9.0f} {row['p50_ms']:>7.2f} {row['p99_ms']:>7.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,302 @@
+"""Out-of-core training from the columnar ride cache.
+
+The notebook stacks the whole augmented dataset into a dense DataFrame,
+so training is capped by RAM. Here rides are read from the typed Parquet
+cache (dataset.py) in batches by an XGBoost DataIter, which engineers the
+features and appends augmented rows batch by batch. XGBoost builds a
+QuantileDMatrix from the batches (about one byte per feature value), or
+with --external-memory pages it to disk, so the float64 frame never exists.
+
+Trees don't need the StandardScaler, so the package has ``scaler=None``
+and serves raw feature values (like an export with --fold-scaler). The
+booster is wrapped in an XGBRegressor and scored on held-out rides
+(test_mae/test_r2/test_rmse), like the notebook's package, so the app and
+incremental.py can use it.
+
+    python -m cycling_speed.streaming --data rides.csv --output models/m.joblib --batch-size 200000
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import xgboost as xgb
+
+from cycling_speed import features
+from cycling_speed.augmentation import AdvancedDataAugmentation
+from cycling_speed.dataset import DATASET_CACHE_DIR, cached_dataset
+
+INPUT_COLUMNS = ['Tanggal', 'Jam_Mulai', 'Durasi_Menit', 'Elevasi', 'Jarak', 'Kec_Rata_Rata',
+                 'Curah_Hujan', 'Jam_Tidur']
+# Synthetic rows per real row, matching the notebook's 60/40/30 on 68 rides
+AUGMENT_FRACTIONS = {'noise': 60 / 68, 'interp': 40 / 68, 'seasonal': 30 / 68}
+DEFAULT_PARAMS = {'objective': 'reg:squarederror', 'eval_metric': 'mae', 'tree_method': 'hist',
+                  'max_depth': 5, 'learning_rate': 0.1, 'subsample': 0.9, 'colsample_bytree': 0.9}
+
+
+def scan_rides(path, rain_anomaly=888.0, batch_size=100_000):
+    """One pass over the cache for what batches can't know alone.
+
+    Returns the rain median used to replace ``rain_anomaly``, per
+    categorical feature the sorted labels that occur (LabelEncoder classes),
+    and the start of the latest ride (None when no ride has a parseable
+    Tanggal and Jam_Mulai).
+    """
+    import pandas as pd
+    import pyarrow.parquet as pq
+
+    rain = pq.read_table(path, columns=['Curah_Hujan']).column(0).to_numpy(zero_copy_only=False)
+    rain_fill = float(np.nanmedian(rain))
+    del rain
+    seen = {name: set() for name in features.CATEGORICAL_FEATURES}
+    last_ride = None
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=INPUT_COLUMNS):
+        df = batch.to_pandas()
+        rain = df['Curah_Hujan'].to_numpy(dtype=np.float64)
+        rain = np.where(rain == rain_anomaly, rain_fill, rain)
+        codes = features.category_codes(
+            df['Elevasi'].to_numpy(dtype=np.float64), df['Jarak'].to_numpy(dtype=np.float64), rain,
+            df['Jam_Tidur'].to_numpy(dtype=np.float64), features.start_hours(df['Jam_Mulai']),
+        )
+        for name, code in codes.items():
+            seen[name].update(np.unique(code).tolist())
+        latest = features.ride_timestamps(df).max()
+        # NaT when no ride in the batch has a start time; it must not stick as the maximum
+        if not pd.isna(latest) and (last_ride is None or latest > last_ride):
+            last_ride = latest
+    # Code -1 (missing) indexes the last label, MISSING_LABEL
+    labels = {name: features.CATEGORICAL_FEATURES[name] + [features.MISSING_LABEL] for name in seen}
+    encoder_classes = {name: np.array(sorted(labels[name][c] for c in seen[name])) for name in seen}
+    return rain_fill, encoder_classes, last_ride
+
+
+class RideBatches(xgb.DataIter):
+    """Feed engineered (and optionally augmented) ride batches to XGBoost.
+
+    Every ``test_every``-th ride goes to the 'test' part, every
+    ``valid_every``-th of the others to 'valid' and the rest to 'train';
+    augmentation is applied to the training part only, seeded by batch
+    number so repeated passes yield identical data. Iterating the object
+    yields the ``(X, y)`` batches directly (used for evaluation).
+    """
+
+    def __init__(self, path, encoder_classes, rain_fill, part='train', batch_size=100_000, valid_every=5,
+                 augment=True, rain_anomaly=888.0, seed=42, cache_prefix=None, test_every=10):
+        self.path = path
+        self.encoders = features.encoder_lookup(encoder_classes)
+        self.rain_fill = rain_fill
+        self.part = part
+        self.batch_size = batch_size
+        self.valid_every = valid_every
+        self.test_every = test_every
+        self.augment = augment and part == 'train'
+        self.rain_anomaly = rain_anomaly
+        self.seed = seed
+        self.rows = 0
+        self.source_rows = 0
+        self._batches = None
+        self._index = 0
+        self._offset = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def reset(self):
+        self._batches = None
+        self._index = 0
+        self._offset = 0
+
+    def next(self, input_data):
+        import pyarrow.parquet as pq
+
+        if self._batches is None:
+            self._batches = pq.ParquetFile(self.path).iter_batches(batch_size=self.batch_size, columns=INPUT_COLUMNS)
+            self.rows = self.source_rows = 0
+        batch = next(self._batches, None)
+        if batch is None:
+            return 0
+        X, y = self.prepare(batch.to_pandas())
+        self._index += 1
+        self.rows += len(X)
+        input_data(data=X, label=y)
+        return 1
+
+    def __iter__(self):
+        import pyarrow.parquet as pq
+
+        self.reset()
+        self.rows = self.source_rows = 0
+        for batch in pq.ParquetFile(self.path).iter_batches(batch_size=self.batch_size, columns=INPUT_COLUMNS):
+            X, y = self.prepare(batch.to_pandas())
+            self._index += 1
+            self.rows += len(X)
+            yield X, y
+
+    def prepare(self, df):
+        """Feature matrix and target of one batch (this part's rows, plus augmentation)."""
+        rows = self._offset + np.arange(len(df))
+        self._offset += len(df)
+        none = np.zeros(len(df), dtype=bool)
+        in_test = rows % self.test_every == self.test_every - 1 if self.test_every else none
+        in_valid = ~in_test & (rows % self.valid_every == 0) if self.valid_every else none
+        df = df[{'test': in_test, 'valid': in_valid}.get(self.part, ~in_test & ~in_valid)]
+        self.source_rows += len(df)
+
+        rain = df['Curah_Hujan'].to_numpy(dtype=np.float64)
+        rain = np.where(rain == self.rain_anomaly, self.rain_fill, rain)
+        columns = features.build_feature_columns(
+            df['Elevasi'], df['Jarak'], rain, df['Jam_Tidur'], features.start_hours(df['Jam_Mulai']),
+            features.days_of_week(df['Tanggal']), df['Durasi_Menit'], df['Kec_Rata_Rata'], self.encoders,
+        )
+        X = features.build_feature_matrix(features.FEATURE_COLUMNS, columns)
+        y = df['Kec_Rata_Rata'].to_numpy(dtype=np.float64)
+        if self.augment and len(X) > 1:
+            augmenter = AdvancedDataAugmentation(X, y, random_state=self.seed + self._index,
+                                                 columns=features.FEATURE_COLUMNS)
+            parts = [
+                augmenter.gaussian_noise_augmentation(n_samples=round(len(X) * AUGMENT_FRACTIONS['noise'])),
+                augmenter.interpolation_augmentation(n_samples=round(len(X) * AUGMENT_FRACTIONS['interp'])),
+                augmenter.seasonal_variation_augmentation(n_samples=round(len(X) * AUGMENT_FRACTIONS['seasonal'])),
+            ]
+            X = np.vstack([X] + [p[0] for p in parts])
+            y = np.concatenate([y] + [p[1] for p in parts])
+        return X.astype(np.float32), y.astype(np.float32)
+
+
+def _label_encoders(encoder_classes):
+    from sklearn.preprocessing import LabelEncoder
+
+    encoders = {}
+    for name, classes in encoder_classes.items():
+        encoder = LabelEncoder()
+        encoder.classes_ = np.asarray(classes)
+        encoders[name] = encoder
+    return encoders
+
+
+def _regressor(booster, params):
+    """XGBRegressor around a trained Booster, so the package has the notebook's sklearn model."""
+    model = xgb.XGBRegressor(n_estimators=booster.num_boosted_rounds(), random_state=params.get('seed'),
+                             **{name: value for name, value in params.items() if name != 'seed'})
+    model.load_model(bytearray(booster.save_raw('ubj')))
+    return model
+
+
+def evaluate_batches(model, batches):
+    """Test metrics of ``model`` over the ``(X, y)`` batches, with the notebook's keys."""
+    from cycling_speed.incremental import regression_metrics
+
+    y_true, y_pred = [], []
+    for X, y in batches:
+        y_true.append(y)
+        y_pred.append(model.predict(X))
+    y_true, y_pred = np.concatenate(y_true), np.concatenate(y_pred)
+    if not len(y_true):
+        raise ValueError("No held-out rides to evaluate on; lower test_every or add rides")
+    return {name: float(value) for name, value in regression_metrics(y_true, y_pred).items()}
+
+
+def train_streaming(source, params=None, num_boost_round=300, early_stopping_rounds=20, batch_size=100_000,
+                    valid_every=5, augment=True, external_memory=False, max_bin=256, seed=42,
+                    cache_dir=DATASET_CACHE_DIR, verbose=True, test_every=10):
+    """Train on ``source`` without materializing the feature matrix; returns a model package.
+
+    The package matches the joblib format served by SpeedPredictor, with an
+    XGBRegressor as 'model' and no scaler. Every ``test_every``-th ride is
+    held out for model_performance.
+    """
+    start = time.perf_counter()
+    path = cached_dataset(source, cache_dir)
+    rain_fill, encoder_classes, last_ride = scan_rides(path, batch_size=batch_size)
+    params = {**DEFAULT_PARAMS, 'seed': seed, 'max_bin': max_bin, **(params or {})}
+    iter_args = dict(encoder_classes=encoder_classes, rain_fill=rain_fill, batch_size=batch_size,
+                     valid_every=valid_every, test_every=test_every, augment=augment, seed=seed)
+    train_iter = RideBatches(path, part='train', cache_prefix=os.path.join(cache_dir, 'xgb-train') if external_memory
+                             else None, **iter_args)
+    valid_iter = RideBatches(path, part='valid', **iter_args)
+    if external_memory:
+        os.makedirs(cache_dir, exist_ok=True)
+        dtrain = xgb.DMatrix(train_iter)
+    else:
+        dtrain = xgb.QuantileDMatrix(train_iter, max_bin=max_bin)
+    evals = []
+    if valid_every:
+        evals = [(xgb.QuantileDMatrix(valid_iter, ref=dtrain, max_bin=max_bin) if not external_memory
+                  else xgb.DMatrix(valid_iter), 'valid')]
+    prepared = time.perf_counter()
+
+    booster = xgb.train(params, dtrain, num_boost_round=num_boost_round, evals=evals,
+                        early_stopping_rounds=early_stopping_rounds if evals else None, verbose_eval=False)
+    performance = {}
+    if evals:
+        performance = {'valid_mae': float(booster.best_score), 'valid_rows': evals[0][0].num_row()}
+        booster = booster[:booster.best_iteration + 1]
+    model = _regressor(booster, params)
+    test_iter = RideBatches(path, part='test', **iter_args)
+    performance = {**evaluate_batches(model, test_iter), 'test_rows': test_iter.source_rows, **performance}
+    trained = time.perf_counter()
+    if verbose:
+        print(f"{dtrain.num_row():,} training rows from {train_iter.source_rows:,} rides, "
+              f"data {prepared - start:.1f}s, boosting {trained - prepared:.1f}s, "
+              f"{booster.num_boosted_rounds()} trees")
+
+    import pandas as pd
+
+    # Booster trained on arrays names features f0, f1, ...
+    gain = booster.get_score(importance_type='gain')
+    total = sum(gain.values()) or 1.0
+    feature_importance = pd.DataFrame({
+        'feature': features.FEATURE_COLUMNS,
+        'importance': [gain.get(f'f{i}', 0.0) / total for i in range(len(features.FEATURE_COLUMNS))],
+    }).sort_values('importance', ascending=False)
+    return {
+        'model': model,
+        'scaler': None,
+        'label_encoders': _label_encoders(encoder_classes),
+        'feature_columns': list(features.FEATURE_COLUMNS),
+        'feature_importance': feature_importance,
+        'model_performance': performance,
+        'training_info': {
+            'original_samples': train_iter.source_rows + valid_iter.source_rows + test_iter.source_rows,
+            'augmented_samples': dtrain.num_row(),
+            'best_params': {**params, 'n_estimators': booster.num_boosted_rounds()},
+            'training_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            # None (like the notebook's package) when no ride had a start time; updates then need since=
+            'last_ride': None if last_ride is None else last_ride.strftime('%Y-%m-%d %H:%M:%S'),
+            'version': 1,
+            'out_of_core': True,
+        },
+    }
+
+
+def main(argv=None):
+    import joblib
+
+    from cycling_speed.training import default_output_path
+
+    parser = argparse.ArgumentParser(description="Train from the ride cache in batches (out of core).")
+    parser.add_argument('--data', required=True, help="ride export (.csv, .xlsx or .parquet)")
+    parser.add_argument('--output', default=None,
+                        help="joblib model package to write (default: a new timestamped file in models/)")
+    parser.add_argument('--params', default=None, help="JSON object of XGBoost parameters")
+    parser.add_argument('--rounds', type=int, default=300)
+    parser.add_argument('--batch-size', type=int, default=100_000, help="rides per batch")
+    parser.add_argument('--no-augment', action='store_true')
+    parser.add_argument('--external-memory', action='store_true', help="page the training matrix to disk")
+    parser.add_argument('--cache-dir', default=DATASET_CACHE_DIR)
+    args = parser.parse_args(argv)
+    output = args.output or default_output_path()
+
+    model_package = train_streaming(
+        args.data, json.loads(args.params) if args.params else None, args.rounds, batch_size=args.batch_size,
+        augment=not args.no_augment, external_memory=args.external_memory, cache_dir=args.cache_dir,
+    )
+    joblib.dump(model_package, output)
+    performance = model_package['model_performance']
+    print(f"Test MAE {performance['test_mae']:.3f} km/h, R² {performance['test_r2']:.3f} "
+          f"on {performance['test_rows']:,} held-out rides")
+    print(f"Saved {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,303 @@
+"""Headless training pipeline (the steps of model5.ipynb as a script).
+
+Training runs as a chain of stages: load -> clean -> features -> augment ->
+split -> tune -> evaluate, then the package is saved. Each stage's output
+is persisted under ``cache_dir`` with a key hashing the stage's settings,
+the source of the stage code and the xgboost/scikit-learn versions
+(code_fingerprint) and the key of the stage before it (the first key includes the data file's SHA-256). A rerun loads
+every stage whose key is unchanged, so changing a tuning setting only
+reruns tune and evaluate, and editing the pipeline code reruns everything.
+The load stage reads the source through the typed Parquet dataset cache
+(dataset.py).
+
+The package is written to a new timestamped file under models/ unless
+--output says otherwise; the served model changes only when it is
+registered and promoted (registry.py) or copied over MODEL_PATH.
+
+    python -m cycling_speed.training --data Book1.xlsx
+    python -m cycling_speed.training --output models/cycling_speed_prediction_model_v2.joblib
+    python -m cycling_speed.training --set tune.max_fits=60 --native models/m.ubj
+"""
+import argparse
+import copy
+import functools
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+from cycling_speed.dataset import DATASET_CACHE_DIR, _temp_path, load_rides, source_fingerprint
+from cycling_speed.features import ride_timestamps
+from cycling_speed.inference import MODEL_PATH
+
+CACHE_DIR = "./.training_cache"
+
+# Modules whose code the stages run and libraries they fit with; all are part of every cache key
+STAGE_MODULES = (
+    'cycling_speed.augmentation', 'cycling_speed.dataset', 'cycling_speed.features', 'cycling_speed.inference',
+    'cycling_speed.scheduler', 'cycling_speed.training', 'cycling_speed.tuning',
+)
+STAGE_LIBRARIES = ('xgboost', 'scikit-learn')
+
+# Settings per stage; every value is part of that stage's cache key
+DEFAULT_CONFIG = {
+    'load': {'data_path': 'Book1.xlsx'},
+    'clean': {'rain_anomaly': 888.0},
+    'features': {},
+    'augment': {'noise_samples': 60, 'interp_samples': 40, 'seasonal_samples': 30, 'random_state': 42},
+    'split': {'test_size': 0.2, 'random_state': 42},
+    'tune': {'n_configs': 27, 'max_rounds': 300, 'max_fits': None, 'time_budget': None, 'random_state': 42},
+    'evaluate': {'cv': 5},
+}
+
+
+@functools.lru_cache(maxsize=None)
+def code_fingerprint():
+    """SHA-256 of the source of STAGE_MODULES and the STAGE_LIBRARIES versions.
+
+    Cached stage outputs go stale when the code or the fitting libraries change.
+    """
+    import importlib
+    import importlib.metadata
+
+    digest = hashlib.sha256()
+    for name in STAGE_MODULES:
+        with open(importlib.import_module(name).__file__, 'rb') as f:
+            digest.update(f.read())
+    for name in STAGE_LIBRARIES:
+        try:
+            version = importlib.metadata.version(name)
+        except importlib.metadata.PackageNotFoundError:
+            version = None
+        digest.update(f'{name}=={version}'.encode())
+    return digest.hexdigest()
+
+
+def default_output_path(now=None):
+    """A new ``models/cycling_speed_model_<YYYYmmdd-HHMMSS>.joblib`` next to MODEL_PATH."""
+    stamp = (now or datetime.now()).strftime('%Y%m%d-%H%M%S')
+    return os.path.join(os.path.dirname(MODEL_PATH), f'cycling_speed_model_{stamp}.joblib')
+
+
+def clean_rides(df, rain_anomaly=888.0):
+    """Replace the logger's rain anomaly value with the column median."""
+    df = df.copy()
+    df.loc[df['Curah_Hujan'] == rain_anomaly, 'Curah_Hujan'] = df['Curah_Hujan'].median()
+    return df
+
+
+def encode_features(df):
+    """Engineered feature matrix X, target y and the fitted LabelEncoders."""
+    from sklearn.preprocessing import LabelEncoder
+
+    from cycling_speed.features import CATEGORICAL_FEATURES, FEATURE_COLUMNS, engineer_features
+
+    df = engineer_features(df)
+    label_encoders = {}
+    for name in CATEGORICAL_FEATURES:
+        encoder = LabelEncoder()
+        df[f'{name}_encoded'] = encoder.fit_transform(df[name].astype(str))
+        label_encoders[name] = encoder
+    return {'X': df[FEATURE_COLUMNS].copy(), 'y': df['Kec_Rata_Rata'].copy(), 'label_encoders': label_encoders}
+
+
+def augment(X, y, noise_samples=60, interp_samples=40, seasonal_samples=30, random_state=42):
+    """Original rows followed by the three kinds of synthetic rows."""
+    import pandas as pd
+
+    from cycling_speed.augmentation import AdvancedDataAugmentation
+
+    augmenter = AdvancedDataAugmentation(X, y, random_state=random_state)
+    parts = [
+        augmenter.gaussian_noise_augmentation(n_samples=noise_samples),
+        augmenter.interpolation_augmentation(n_samples=interp_samples),
+        augmenter.seasonal_variation_augmentation(n_samples=seasonal_samples),
+    ]
+    X_augmented = np.vstack([X.values] + [p[0] for p in parts])
+    y_augmented = np.hstack([y.values] + [p[1] for p in parts])
+    return pd.DataFrame(X_augmented, columns=X.columns), pd.Series(y_augmented)
+
+
+def split_and_scale(X, y, test_size=0.2, random_state=42):
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import StandardScaler
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=random_state)
+    scaler = StandardScaler()
+    return {
+        'X_train': X_train, 'X_test': X_test, 'y_train': y_train, 'y_test': y_test, 'scaler': scaler,
+        'X_train_scaled': scaler.fit_transform(X_train), 'X_test_scaled': scaler.transform(X_test),
+    }
+
+
+def tune(X_train_scaled, y_train, **search_params):
+    from cycling_speed.tuning import SuccessiveHalvingSearch
+
+    search = SuccessiveHalvingSearch(verbose=False, **search_params).fit(X_train_scaled, y_train)
+    return {'model': search.best_estimator_, 'best_params': search.best_params_,
+            'best_score': search.best_score_, 'n_fits': search.n_fits_}
+
+
+def evaluate(model, split, feature_columns, cv=5):
+    """Test metrics, cross-validated MAE and feature importance, as stored in the package."""
+    import pandas as pd
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+    from sklearn.model_selection import cross_val_score
+
+    y_test = split['y_test']
+    y_pred_test = model.predict(split['X_test_scaled'])
+    cv_scores = cross_val_score(model, split['X_train_scaled'], split['y_train'], cv=cv,
+                                scoring='neg_mean_absolute_error')
+    feature_importance = pd.DataFrame({
+        'feature': feature_columns,
+        'importance': model.feature_importances_,
+    }).sort_values('importance', ascending=False)
+    return {
+        'model_performance': {
+            'test_mae': mean_absolute_error(y_test, y_pred_test),
+            'test_r2': r2_score(y_test, y_pred_test),
+            'test_rmse': np.sqrt(mean_squared_error(y_test, y_pred_test)),
+            'cv_mae_mean': -cv_scores.mean(),
+            'cv_mae_std': cv_scores.std(),
+        },
+        'feature_importance': feature_importance,
+    }
+
+
+class TrainingPipeline:
+    """Run the training stages with on-disk caching and per-stage timings.
+
+    ``config`` overrides DEFAULT_CONFIG per stage, e.g.
+    ``{'tune': {'max_fits': 60}}``. ``timings`` maps stage name to
+    ``(seconds, cached)`` after run().
+    """
+
+    def __init__(self, config=None, cache_dir=CACHE_DIR, dataset_cache_dir=DATASET_CACHE_DIR, verbose=True):
+        self.config = copy.deepcopy(DEFAULT_CONFIG)
+        for stage, params in (config or {}).items():
+            self.config.setdefault(stage, {}).update(params)
+        self.cache_dir = cache_dir
+        self.dataset_cache_dir = dataset_cache_dir
+        self.verbose = verbose
+        self.timings = {}
+        self._key = ''
+
+    def stage(self, name, compute, extra_key=None):
+        """Return the output of stage ``name``, from the cache when its key is unchanged."""
+        import joblib
+
+        settings = {'stage': name, 'params': self.config.get(name, {}), 'extra': extra_key, 'parent': self._key,
+                    'code': code_fingerprint()}
+        self._key = hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode()).hexdigest()
+        path = os.path.join(self.cache_dir, f'{name}-{self._key[:16]}.joblib')
+        start = time.perf_counter()
+        if os.path.exists(path):
+            output, cached = joblib.load(path), True
+        else:
+            output, cached = compute(**self.config.get(name, {})), False
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Pipelines running at once each write their own file; the last os.replace wins
+            temp = _temp_path(path, '.tmp')
+            try:
+                joblib.dump(output, temp)
+                os.replace(temp, path)
+            finally:
+                if os.path.exists(temp):
+                    os.remove(temp)
+        seconds = time.perf_counter() - start
+        self.timings[name] = (seconds, cached)
+        if self.verbose:
+            print(f"{name:<10} {seconds:>8.3f}s{'  (cached)' if cached else ''}")
+        return output
+
+    def run(self):
+        """Run every stage and return the model package dict (as saved by the notebook)."""
+        self._key = ''
+        self.timings = {}
+        data_path = self.config['load']['data_path']
+        df = self.stage('load', lambda data_path: load_rides(data_path, self.dataset_cache_dir),
+                        extra_key=source_fingerprint(data_path, self.dataset_cache_dir))
+        df = self.stage('clean', lambda **params: clean_rides(df, **params))
+        data = self.stage('features', lambda: encode_features(df))
+        X_augmented, y_augmented = self.stage('augment', lambda **params: augment(data['X'], data['y'], **params))
+        split = self.stage('split', lambda **params: split_and_scale(X_augmented, y_augmented, **params))
+        tuned = self.stage('tune', lambda **params: tune(split['X_train_scaled'], split['y_train'], **params))
+        feature_columns = list(data['X'].columns)
+        evaluation = self.stage('evaluate', lambda **params: evaluate(tuned['model'], split, feature_columns, **params))
+
+        return {
+            'model': tuned['model'],
+            'scaler': split['scaler'],
+            'label_encoders': data['label_encoders'],
+            'feature_columns': feature_columns,
+            'feature_importance': evaluation['feature_importance'],
+            'model_performance': evaluation['model_performance'],
+            'training_info': {
+                'original_samples': len(data['X']),
+                'augmented_samples': len(X_augmented),
+                'best_params': tuned['best_params'],
+                'training_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                # Incremental updates (incremental.py) start after this ride
+                'last_ride': ride_timestamps(df).max().strftime('%Y-%m-%d %H:%M:%S'),
+                'version': 1,
+            },
+        }
+
+
+def _parse_override(text):
+    """'stage.param=value' with a JSON value (bare strings allowed)."""
+    key, _, value = text.partition('=')
+    stage, _, param = key.partition('.')
+    try:
+        value = json.loads(value)
+    except json.JSONDecodeError:
+        pass
+    return stage, param, value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the cycling speed model with cached stages.")
+    parser.add_argument('--data', default=DEFAULT_CONFIG['load']['data_path'], help="ride export (.xlsx)")
+    parser.add_argument('--output', default=None,
+                        help="joblib model package to write (default: a new timestamped file in models/)")
+    parser.add_argument('--native', default=None, help="also export a native model (.ubj/.json/.npz), scaler folded")
+    parser.add_argument('--config', default=None, help="JSON file with per-stage settings")
+    parser.add_argument('--set', action='append', default=[], metavar='STAGE.PARAM=VALUE',
+                        help="override one setting, e.g. tune.max_fits=60")
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    args = parser.parse_args(argv)
+    output = args.output or default_output_path()
+
+    config = {'load': {'data_path': args.data}}
+    if args.config:
+        with open(args.config, encoding='utf-8') as f:
+            for stage, params in json.load(f).items():
+                config.setdefault(stage, {}).update(params)
+    for override in args.set:
+        stage, param, value = _parse_override(override)
+        config.setdefault(stage, {})[param] = value
+
+    import joblib
+
+    start = time.perf_counter()
+    pipeline = TrainingPipeline(config, args.cache_dir)
+    model_package = pipeline.run()
+    save_start = time.perf_counter()
+    joblib.dump(model_package, output)
+    if args.native:
+        from cycling_speed.export import export_native
+
+        export_native(model_package, args.native, fold_scaler=True)
+    print(f"{'save':<10} {time.perf_counter() - save_start:>8.3f}s")
+    print(f"{'total':<10} {time.perf_counter() - start:>8.3f}s")
+    performance = model_package['model_performance']
+    print(f"Test MAE {performance['test_mae']:.3f} km/h, R² {performance['test_r2']:.3f}; saved {output}")
+    if os.path.abspath(output) != os.path.abspath(MODEL_PATH):
+        print(f"To serve it: python -m cycling_speed.registry register {output} --promote")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+"""Budgeted hyperparameter search for the XGBoost speed model.
+
+Replaces the notebook's exhaustive GridSearchCV (2,187 combinations x 5
+folds) with successive halving: a random sample of grid configurations is
+trained for a few boosting rounds, the best 1/eta continue with eta times
+more rounds, and so on up to ``max_rounds``. Boosting rounds are the
+resource, every fit early-stops on a held-out validation split, and
+promoted trials continue from their booster instead of starting over.
+
+The training and validation rows are quantized once into a pair of
+QuantileDMatrix objects (``tree_method='hist'``) shared by every trial, so
+the quantile sketch is not rebuilt per fit the way XGBRegressor.fit inside
+GridSearchCV rebuilds it.
+
+Each finished fit is appended to ``results_path`` (JSON lines), so an
+interrupted or budget-limited search picks up where it stopped. Boosters
+are not saved, so a resumed trial that is promoted retrains from scratch.
+
+    search = SuccessiveHalvingSearch(max_fits=60, results_path='tuning.jsonl')
+    search.fit(X_train_scaled, y_train)
+    search.best_params_, search.best_estimator_
+
+    python -m cycling_speed.tuning --rows 20000   # shared vs per-fit data matrices
+"""
+import argparse
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+from cycling_speed.scheduler import CpuScheduler
+
+# Same values as the notebook's param_grid; n_estimators is the searched resource
+PARAM_SPACE = {
+    'max_depth': [3, 5, 7],
+    'learning_rate': [0.01, 0.1, 0.2],
+    'subsample': [0.8, 0.9, 1.0],
+    'colsample_bytree': [0.8, 0.9, 1.0],
+    'reg_alpha': [0, 0.1, 0.5],
+    'reg_lambda': [0, 0.1, 0.5],
+}
+MAX_ROUNDS = 300
+
+
+def sample_configs(space, n_configs, rng):
+    """Draw up to ``n_configs`` distinct configurations from a grid ``space``."""
+    names = list(space)
+    sizes = [len(space[name]) for name in names]
+    total = math.prod(sizes)
+    configs = []
+    for flat in rng.choice(total, size=min(n_configs, total), replace=False):
+        config = {}
+        # Decode the flat grid index (mixed radix, last parameter fastest)
+        for name, size in zip(reversed(names), reversed(sizes)):
+            flat, i = divmod(int(flat), size)
+            config[name] = space[name][i]
+        configs.append({name: config[name] for name in names})
+    return configs
+
+
+def config_key(config):
+    return json.dumps(config, sort_keys=True)
+
+
+def load_results(path):
+    """Finished fits from a results file, keyed by (config key, rounds)."""
+    results = {}
+    if path and os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    results[(config_key(record['params']), record['rounds'])] = record
+    return results
+
+
+class SuccessiveHalvingSearch:
+    """Successive-halving search over boosting rounds with early stopping.
+
+    ``n_configs`` configurations start at ``max_rounds / eta**(n_rungs-1)``
+    rounds; each rung keeps the best ``1/eta`` by validation MAE. The search
+    stops early when ``max_fits`` fits or ``time_budget`` seconds are used up
+    and reports the best trial seen. Trials of a rung run concurrently on a
+    CpuScheduler (``scheduler``, or one over ``n_jobs`` cores) that splits the
+    cores between parallel fits and XGBoost threads per fit.
+
+    After fit(): ``best_params_`` (XGBRegressor kwargs, with n_estimators set
+    to the early-stopped round count), ``best_score_`` (validation MAE),
+    ``best_estimator_`` (refit on all rows unless ``refit=False``) and
+    ``results_`` (one dict per fit). ``reuse_data=False`` builds a fresh
+    DMatrix for every fit instead (the old behaviour, kept for benchmarks).
+    """
+
+    def __init__(self, space=None, n_configs=27, max_rounds=MAX_ROUNDS, eta=3, n_rungs=3,
+                 early_stopping_rounds=20, valid_fraction=0.2, max_fits=None, time_budget=None,
+                 results_path=None, random_state=42, n_jobs=None, scheduler=None, refit=True, max_bin=256,
+                 reuse_data=True, verbose=True):
+        self.space = PARAM_SPACE if space is None else space
+        self.n_configs = n_configs
+        self.max_rounds = max_rounds
+        self.eta = eta
+        self.n_rungs = n_rungs
+        self.early_stopping_rounds = early_stopping_rounds
+        self.valid_fraction = valid_fraction
+        self.max_fits = max_fits
+        self.time_budget = time_budget
+        self.results_path = results_path
+        self.random_state = random_state
+        self.n_jobs = n_jobs
+        self.scheduler = scheduler
+        self.refit = refit
+        self.max_bin = max_bin
+        self.reuse_data = reuse_data
+        self.verbose = verbose
+
+    def rung_rounds(self):
+        """Boosting rounds per rung, smallest first."""
+        return [max(1, int(round(self.max_rounds / self.eta ** k))) for k in reversed(range(self.n_rungs))]
+
+    def _booster_params(self, config):
+        return {'objective': 'reg:squarederror', 'eval_metric': 'mae', 'tree_method': 'hist',
+                'max_bin': self.max_bin, **config}
+
+    def fit(self, X, y):
+        import xgboost as xgb
+
+        X = np.asarray(X, dtype=np.float32)
+        y = np.asarray(y, dtype=np.float32)
+        rng = np.random.default_rng(self.random_state)
+        order = rng.permutation(len(X))
+        n_valid = max(1, int(len(X) * self.valid_fraction))
+        valid, train = order[:n_valid], order[n_valid:]
+
+        done = load_results(self.results_path)
+        scheduler = self.scheduler or CpuScheduler(self.n_jobs)
+        start = time.perf_counter()
+        shared = None
+        if self.reuse_data:
+            # Quantized once; training only reads the bins, so fit threads can share them
+            dtrain = xgb.QuantileDMatrix(X[train], label=y[train], max_bin=self.max_bin, nthread=scheduler.n_cpus)
+            shared = (dtrain, xgb.QuantileDMatrix(X[valid], label=y[valid], ref=dtrain, nthread=scheduler.n_cpus))
+        self.data_s_ = time.perf_counter() - start
+
+        def fit_one(trial, nthread):
+            if self.time_budget is not None and time.perf_counter() - start >= self.time_budget:
+                return None
+            data = shared or (xgb.DMatrix(X[train], label=y[train], nthread=nthread),
+                              xgb.DMatrix(X[valid], label=y[valid], nthread=nthread))
+            return self._fit_trial(xgb, trial, rounds, *data, nthread)
+
+        fits = 0
+        results = []
+        trials = [{'params': config, 'booster': None, 'score': math.inf} for config in
+                  sample_configs(self.space, self.n_configs, rng)]
+
+        def budget_left():
+            if self.max_fits is not None and fits >= self.max_fits:
+                return False
+            return self.time_budget is None or time.perf_counter() - start < self.time_budget
+
+        rungs = self.rung_rounds()
+        for rung, rounds in enumerate(rungs):
+            pending = []
+            for trial in trials:
+                key = (config_key(trial['params']), rounds)
+                if key in done:
+                    trial['booster'] = None
+                    self._record(trial, dict(done[key], rung=rung), results, fits)
+                elif trial.get('stopped'):
+                    # Early stopping already ended this trial below ``rounds``
+                    self._record(trial, dict(trial['record'], rounds=rounds, rung=rung), results, fits)
+                else:
+                    pending.append(trial)
+            if self.max_fits is not None:
+                pending = pending[:max(0, self.max_fits - fits)]
+            records = scheduler.map(fit_one, pending)
+            for trial, record in zip(pending, records):
+                if record is None:
+                    continue
+                record['rung'] = rung
+                fits += 1
+                if self.results_path:
+                    with open(self.results_path, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(record) + '\n')
+                self._record(trial, record, results, fits)
+            if not budget_left() or rung == len(rungs) - 1:
+                break
+            trials = [t for t in trials if 'record' in t and t['record']['rounds'] == rounds]
+            trials = sorted(trials, key=lambda t: t['score'])[:max(1, len(trials) // self.eta)]
+
+        if not results:
+            raise RuntimeError("Search budget allowed no fits")
+        best = min(results, key=lambda r: (r['score'], -r['rounds']))
+        self.results_ = results
+        self.n_fits_ = fits
+        self.elapsed_s_ = time.perf_counter() - start
+        self.best_score_ = best['score']
+        self.best_params_ = {**best['params'], 'n_estimators': best['best_rounds']}
+        if self.refit:
+            _, inner = scheduler.split(1)
+            self.best_estimator_ = xgb.XGBRegressor(
+                random_state=self.random_state, n_jobs=inner, tree_method='hist', max_bin=self.max_bin,
+                **self.best_params_).fit(X, y)
+        return self
+
+    def _record(self, trial, record, results, fits):
+        trial['score'] = record['score']
+        trial['stopped'] = record['stopped']
+        trial['record'] = record
+        results.append(record)
+        if self.verbose:
+            print(f"rung {record['rung']} rounds {record['rounds']:>4} fits {fits:>4} "
+                  f"MAE {record['score']:.4f} {trial['params']}")
+
+    def _fit_trial(self, xgb, trial, rounds, dtrain, dvalid, nthread):
+        """Train (or continue) one trial to ``rounds`` and return its result record."""
+        booster = trial['booster']
+        prev = trial.get('record') if booster is not None else None
+        trained = booster.num_boosted_rounds() if booster is not None else 0
+        fit_start = time.perf_counter()
+        # XGBoost's sampling RNG is per OS thread and only reseeded when the seed
+        # changes, so vary it with the rounds already trained to make a continued
+        # fit independent of which thread runs it
+        params = {**self._booster_params(trial['params']), 'nthread': nthread, 'seed': self.random_state + trained}
+        booster = xgb.train(
+            params, dtrain, num_boost_round=rounds - trained,
+            evals=[(dvalid, 'valid')], early_stopping_rounds=self.early_stopping_rounds,
+            verbose_eval=False, xgb_model=booster,
+        )
+        trial['booster'] = booster
+        score, best_rounds = float(booster.best_score), booster.best_iteration + 1
+        # A continued fit only reports the best of its own rounds
+        if prev is not None and prev['score'] <= score:
+            score, best_rounds = prev['score'], prev['best_rounds']
+        return {
+            'params': trial['params'],
+            'rounds': rounds,
+            'score': score,
+            'best_rounds': best_rounds,
+            'stopped': booster.num_boosted_rounds() < rounds,
+            'fit_s': time.perf_counter() - fit_start,
+        }
+
+
+def benchmark(n_rows=20_000, n_features=18, seed=0, **search_params):
+    """Time the same search with shared QuantileDMatrix data and with a DMatrix per fit."""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, n_features))
+    y = X[:, 0] * 3 + X[:, 1] ** 2 + rng.normal(size=n_rows)
+    results = []
+    for reuse_data in (False, True):
+        search = SuccessiveHalvingSearch(refit=False, verbose=False, reuse_data=reuse_data, **search_params)
+        start = time.perf_counter()
+        search.fit(X, y)
+        results.append({'reuse_data': reuse_data, 'seconds': time.perf_counter() - start, 'fits': search.n_fits_,
+                        'best_score': search.best_score_})
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark shared QuantileDMatrix data against a DMatrix per fit.")
+    parser.add_argument('--rows', type=int, default=20_000)
+    parser.add_argument('--configs', type=int, default=27)
+    parser.add_argument('--max-rounds', type=int, default=MAX_ROUNDS)
+    parser.add_argument('--jobs', type=int, default=None, help="cores for the search (default: available)")
+    args = parser.parse_args(argv)
+
+    print(f"Successive halving, {args.configs} configs up to {args.max_rounds} rounds, {args.rows:,} rows")
+    print(f"{'data':<22} {'fits':>5} {'seconds':>9} {'best MAE':>9}")
+    for row in benchmark(args.rows, n_configs=args.configs, max_rounds=args.max_rounds, n_jobs=args.jobs):
+        label = 'shared QuantileDMatrix' if row['reuse_data'] else 'DMatrix per fit'
+        print(f"{label:<22} {row['fits']:>5} {row['seconds']:>9.2f} {row['best_score']:>9.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -6,6 +6,9 @@ import pandas as pd
 import numpy as np
 from datetime import datetime
 
+from cycling_speed.assets import GALLERY_IMAGES, GALLERY_WIDTH, asset_path, image_bytes
+from cycling_speed.loader import get_loader
+
 # -------- Page configuration --------
 st.set_page_config(
     page_title="👤 PREDIKSI KECEPATAN RATA-RATA BERSEPEDA BERDASARKAN KONDISI TOPOGRAFI DAN FAKTOR CUACA MENGGUNAKAN XGBOOST DARI DATA STRAVA",
@@ -44,6 +47,9 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
+# Warm the prediction model in the background while visitors read the home page
+get_loader().start()
+
 
 def main():
     # Header
@@ -111,11 +117,11 @@ def main():
     with col2:
         st.subheader("📸 Project Gallery")
 
-        gallery = ["assets/home1.jpg", "assets/home2.jpg", "assets/home3.jpg"]
+        gallery = [asset_path(name) for name in GALLERY_IMAGES]
 
-        # Slider untuk navigasi
+        # Slider untuk navigasi (resized WebP, built once and cached in memory)
         index = st.slider("Geser untuk lihat gambar", 1, len(gallery), 1)
-        st.image(gallery[index-1], use_column_width=True, caption=f"Gambar {index}")
+        st.image(image_bytes(gallery[index-1], GALLERY_WIDTH), use_column_width=True, caption=f"Gambar {index}")
 
     # Development Process
     st.subheader("⚙️ Development Process")
@@ -1,16 +1,18 @@
 # path: app.py
 import streamlit as st
-import joblib
-import pandas as pd
 import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import datetime
+import os
 from datetime import time
 import warnings
 warnings.filterwarnings('ignore')
 
+from cycling_speed import categorize, heuristic_speed, metrics
+from cycling_speed.cache import PredictionCache, model_version, prediction_key
+from cycling_speed.charts import comparison_figure, radar_figure
+from cycling_speed.loader import format_timings, get_loader
+from cycling_speed.scenarios import DEFAULT_SCENARIOS, predict_scenarios
+
 # Page configuration
 st.set_page_config(
     page_title="📊 Cycling Speed Predictor - App",
@@ -74,18 +76,33 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
-# Load model
-@st.cache_resource
+# Prediction cache settings (size 0 disables caching; TTL in seconds, 0 = no expiry)
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", 4096))
+PREDICTION_CACHE_TTL = float(os.environ.get("PREDICTION_CACHE_TTL", 0)) or None
+# Cached demo predictions must not depend on random noise
+DETERMINISTIC = PREDICTION_CACHE_SIZE > 0
+# Cache version of demo (heuristic) results, so they are never served once the real model is up
+DEMO_VERSION = 'demo'
+
+# Load model in the background (started by whichever page runs first). Serves the
+# registry's promoted version when models/registry exists, else MODEL_PATH
+model_loader = get_loader().start()
+
+
 def load_model():
-    """Load trained model; fall back to dummy if not found (keeps app usable)."""
-    try:
-        model_package = joblib.load("./models/cycling_speed_prediction_model_v2.joblib")
-        return model_package
-    except FileNotFoundError:
-        return create_dummy_model_package()
-    except Exception as e:
-        st.error(f"⚠️ Error loading model: {str(e)}")
-        return create_dummy_model_package()
+    """Wait for the background loader; fall back to dummy if not found (keeps app usable)."""
+    model_loader.wait()
+    if model_loader.model_package is not None:
+        return model_loader.model_package
+    if not isinstance(model_loader.error, FileNotFoundError):
+        st.error(f"⚠️ Error loading model: {str(model_loader.error)}")
+    return create_dummy_model_package()
+
+
+@st.cache_resource
+def get_prediction_cache():
+    """Prediction cache shared by all sessions on this server."""
+    return PredictionCache(maxsize=PREDICTION_CACHE_SIZE, ttl=PREDICTION_CACHE_TTL)
 
 
 def create_dummy_model_package():
@@ -105,8 +122,8 @@ def create_dummy_model_package():
 
 
 # Demo prediction (unchanged)
-def predict_cycling_speed_demo(elevasi, jarak, curah_hujan, jam_tidur, jam_mulai):
-    """Simple heuristic used when real model is unavailable; adds small stochasticity."""
+def predict_cycling_speed_demo(elevasi, jarak, curah_hujan, jam_tidur, jam_mulai, deterministic=False):
+    """Simple heuristic used when real model is unavailable; adds small stochasticity unless deterministic."""
     try:
         base_speed = 22.0
         distance_factor = max(0.85, 1 - (jarak - 25) * 0.01)
@@ -123,7 +140,8 @@ def predict_cycling_speed_demo(elevasi, jarak, curah_hujan, jam_tidur, jam_mulai
             time_factor = 0.95
 
         prediction = base_speed * distance_factor * elevation_factor * rain_factor * sleep_factor * time_factor
-        prediction += np.random.normal(0, 0.5)
+        if not deterministic:
+            prediction += np.random.normal(0, 0.5)
         prediction = max(10, min(35, prediction))
 
         time_category = (
@@ -151,61 +169,139 @@ def predict_cycling_speed_demo(elevasi, jarak, curah_hujan, jam_tidur, jam_mulai
 
 # Wrapper prediction
 def predict_cycling_speed(elevasi, jarak, curah_hujan, jam_tidur, jam_mulai, model_package):
-    """Use real model if present; otherwise fallback to demo."""
-    if 'model' in model_package:
-        # Placeholder for real model inference path
-        pass
-    return predict_cycling_speed_demo(elevasi, jarak, curah_hujan, jam_tidur, jam_mulai)
+    """Use real model if present; otherwise fallback to demo. Results are cached per input."""
+    # One snapshot, so a model hot swap can't pair the new model's cache key with the old predictor
+    active_package, predictor = model_loader.snapshot()
+    version = DEMO_VERSION if predictor is None else model_version(active_package or model_package)
+    key = prediction_key(elevasi, jarak, curah_hujan, jam_tidur, jam_mulai, version)
+    cached = prediction_cache.get(key)
+    if cached is not None:
+        return cached
+
+    result = None
+    if predictor is not None:
+        try:
+            prediction = predictor.predict_one(elevasi, jarak, curah_hujan, jam_tidur, jam_mulai)
+            categories = categorize(elevasi, jarak, curah_hujan, jam_tidur, jam_mulai.hour)
+            result = (prediction, *(str(labels) for labels in categories))
+        except Exception as e:
+            st.error(f"Model prediction error, using demo: {str(e)}")
+    if result is None:
+        result = predict_cycling_speed_demo(
+            elevasi, jarak, curah_hujan, jam_tidur, jam_mulai, deterministic=DETERMINISTIC
+        )
+        key = prediction_key(elevasi, jarak, curah_hujan, jam_tidur, jam_mulai, DEMO_VERSION)
+    if result[0] is not None:
+        prediction_cache.put(key, result)
+    return result
+
+
+def predict_speed_batch(elevasi, jarak, curah_hujan, jam_tidur, hour, predictor=None):
+    """Predict many input rows at once (real model if present; otherwise vectorized demo)."""
+    if predictor is not None:
+        return predictor.predict(elevasi, jarak, curah_hujan, jam_tidur, hour)
+    speeds = heuristic_speed(elevasi, jarak, curah_hujan, jam_tidur, hour)
+    if not DETERMINISTIC:
+        speeds = speeds + np.random.normal(0, 0.5, np.shape(speeds))
+    return np.clip(speeds, 10, 35)
+
+
+def predict_comparison(elevasi, jarak, curah_hujan, jam_tidur, jam_mulai, model_package, scenarios=DEFAULT_SCENARIOS):
+    """Predict the Speed Comparison scenarios in one batch, cached like single predictions."""
+    active_package, predictor = model_loader.snapshot()
+    version = DEMO_VERSION if predictor is None else model_version(active_package or model_package)
+    key = (
+        'scenarios',
+        prediction_key(elevasi, jarak, curah_hujan, jam_tidur, jam_mulai, version),
+        tuple((name, tuple(sorted(overrides.items()))) for name, overrides in scenarios),
+    )
+    with metrics.timer('scenario_predict'):
+        return prediction_cache.get_or_compute(key, lambda: predict_scenarios(
+            lambda *inputs: predict_speed_batch(*inputs, predictor=predictor),
+            {'elevasi': elevasi, 'jarak': jarak, 'curah_hujan': curah_hujan, 'jam_tidur': jam_tidur,
+             'hour': jam_mulai.hour},
+            scenarios,
+        ))
 
 
-# Load the model once
-model_package = load_model()
+prediction_cache = get_prediction_cache()
 
 
 # =====================
 # Main app (LAYOUT FIX)
 # =====================
-
-def main():
-    # Header
-    st.markdown('<h1 class="main-header">📊 Cycling Speed Predictor</h1>', unsafe_allow_html=True)
-    st.markdown("### 🔊 Prediksi Kecepatan Rata-rata Bersepeda Berdasarkan Kondisi Topografi & Cuaca")
-    st.info("🏠 Kembali ke **Home** atau kunjungi **👤 Profile** untuk informasi developer")
-
-    # Sidebar — Model information
-    with st.sidebar:
-        st.header("📋 Model Information")
-        if 'model_performance' in model_package:
-            perf = model_package['model_performance']
-            st.markdown(
-                f"""
-            **📈 Model Performance:**
-            - **MAE**: {perf['test_mae']:.3f} km/h
-            - **R²**: {perf['test_r2']:.3f}
-            - **RMSE**: {perf['test_rmse']:.3f} km/h
-            """
-            )
-        if 'training_info' in model_package:
-            info = model_package['training_info']
-            st.markdown(
-                f"""
-            **🔧 Training Info:**
-            - **Original Samples**: {info['original_samples']}
-            - **Augmented Samples**: {info['augmented_samples']}
-            - **Training Date**: {info['training_date']}
-            """
-            )
-        st.markdown("---")
-        st.markdown("**🎯 Input Guidelines:**")
+# Only full reruns (first load, navigation) run the header, CSS and sidebar. Submitting the
+# form reruns just the prediction_section fragment, and the charts are patched copies of
+# figure templates built once per process (cycling_speed/charts.py).
+
+def model_information():
+    """Sidebar model details and cache statistics."""
+    st.header("📋 Model Information")
+    if model_loader.ready:
+        model_package = load_model()
+    else:
+        model_package = {}
+        st.info("⏳ Model is warming up in the background...")
+    if 'model_performance' in model_package:
+        perf = model_package['model_performance']
+        st.markdown(
+            f"""
+        **📈 Model Performance:**
+        - **MAE**: {perf['test_mae']:.3f} km/h
+        - **R²**: {perf['test_r2']:.3f}
+        - **RMSE**: {perf['test_rmse']:.3f} km/h
+        """
+        )
+    if 'training_info' in model_package:
+        info = model_package['training_info']
         st.markdown(
-            """
-        - **Elevasi**: 50-700m
-        - **Jarak**: 10-50 km
-        - **Curah Hujan**: 0-100mm
-        - **Jam Tidur**: 1-12 jam
+            f"""
+        **🔧 Training Info:**
+        - **Original Samples**: {info['original_samples']}
+        - **Augmented Samples**: {info['augmented_samples']}
+        - **Training Date**: {info['training_date']}
         """
         )
+    registry_entry = getattr(model_loader, 'entry', None)
+    if registry_entry is not None:
+        st.caption(f"🗂️ Registry version v{registry_entry['version']} ({registry_entry['sha256'][:12]})")
+    if model_loader.timings:
+        st.caption(f"🚀 Cold start: {format_timings(model_loader.timings)}")
+    cache_stats = prediction_cache.stats()
+    st.markdown(
+        f"""
+        **⚡ Prediction Cache:**
+        - **Hits / Misses**: {cache_stats['hits']} / {cache_stats['misses']}
+        - **Hit Rate**: {cache_stats['hit_rate']:.0%}
+        - **Entries**: {cache_stats['size']} / {cache_stats['maxsize']}
+        """
+    )
+    if metrics.ENABLED:
+        # Refreshed on full reruns only, like the rest of the sidebar
+        with st.expander("⏱️ Latency Metrics"):
+            stats = metrics.snapshot()
+            st.markdown("\n".join(
+                f"- **{stage}**: p50 {s['p50_ms']:.2f} ms, p99 {s['p99_ms']:.2f} ms ({s['count']})"
+                for stage, s in stats.items()
+            ) or "No measurements yet.")
+            st.download_button("Prometheus", metrics.prometheus_text(), file_name="metrics.prom")
+            st.download_button("JSON", metrics.to_json(), file_name="metrics.json")
+    st.markdown("---")
+    st.markdown("**🎯 Input Guidelines:**")
+    st.markdown(
+        """
+    - **Elevasi**: 50-700m
+    - **Jarak**: 10-50 km
+    - **Curah Hujan**: 0-100mm
+    - **Jam Tidur**: 1-12 jam
+    """
+    )
 
+
+@st.fragment
+@metrics.timed('request')
+def prediction_section():
+    """Form, input radar, prediction card and analysis; a form submit reruns only this."""
     # ===== Two main columns =====
     col1, col2 = st.columns([3, 2])
 
@@ -239,29 +335,10 @@ def main():
 
         # --- Input Visualization moved into Col1 ---
         st.subheader("📊 Input Visualization")
-        categories = ['Distance\n(Normalized)', 'Elevation\n(Normalized)', 'Rain\n(Inverted)', 'Sleep\n(Normalized)']
-        values = [
-            jarak / 50,
-            elevasi / 700,
-            1 - (curah_hujan / 100),
-            jam_tidur / 12,
-        ]
-        fig_radar = go.Figure(
-            data=go.Scatterpolar(
-                r=values,
-                theta=categories,
-                fill='toself',
-                line=dict(color='rgb(255, 107, 107)'),
-                fillcolor='rgba(255, 107, 107, 0.3)',
-            )
-        )
-        fig_radar.update_layout(
-            polar=dict(radialaxis=dict(visible=True, range=[0, 1])),
-            showlegend=False,
-            title="Input Parameters Overview",
-            height=300,
-        )
-        st.plotly_chart(fig_radar, use_container_width=True)
+        with metrics.timer('figure_build'):
+            fig_radar = radar_figure(jarak, elevasi, curah_hujan, jam_tidur)
+        with metrics.timer('chart_render'):
+            st.plotly_chart(fig_radar, use_container_width=True)
 
         st.markdown('<div class="weather-info">', unsafe_allow_html=True)
         if curah_hujan == 0:
@@ -278,75 +355,77 @@ def main():
     with col2:
         if predict_button:
             with st.spinner("🔮 Calculating prediction..."):
+                model_package = load_model()
                 prediction, time_cat, elev_cat, rain_cat, dist_cat, sleep_cat = predict_cycling_speed(
                     elevasi, jarak, curah_hujan, jam_tidur, jam_mulai, model_package
                 )
 
             if prediction is not None:
-                st.markdown(
-                    f"""
-                <div class="prediction-card">
-                    <h2>🎯 Predicted Speed</h2>
-                    <h1 style="font-size: 4rem; margin: 1rem 0;">{prediction:.1f} km/h</h1>
-                    <p style="font-size: 1.2rem;">Based on your input conditions</p>
-                </div>
-                """,
-                    unsafe_allow_html=True,
-                )
-
-                # Mini cards (nested columns within the narrower right column)
-                mini1, mini2, mini3 = st.columns(3)
-
-                with mini1:
-                    if prediction < 16:
-                        speed_category, speed_color = "🌊 Leisurely", "#3498db"
-                    elif prediction < 20:
-                        speed_category, speed_color = "🚴‍♀️ Moderate", "#f39c12"
-                    elif prediction < 24:
-                        speed_category, speed_color = "🚴‍♂️ Fast", "#e67e22"
-                    else:
-                        speed_category, speed_color = "🏆 Very Fast", "#e74c3c"
-                    st.markdown(
-                        f"""
-                    <div style="background: {speed_color}; color: white; padding: 1rem; border-radius: 10px; text-align: center;">
-                        <h5>{speed_category}</h5>
-                        <p>Speed Category</p>
-                    </div>
-                    """,
-                        unsafe_allow_html=True,
-                    )
-
-                with mini2:
-                    estimated_time = jarak / prediction * 60  # minutes
-                    hours = int(estimated_time // 60)
-                    minutes = int(estimated_time % 60)
+                with metrics.timer('render'):
                     st.markdown(
                         f"""
-                    <div style="background: #27ae60; color: white; padding: 1rem; border-radius: 10px; text-align: center;">
-                        <h5>⏱️ {hours:02d}:{minutes:02d}</h5>
-                        <p>Estimated Time</p>
+                    <div class="prediction-card">
+                        <h2>🎯 Predicted Speed</h2>
+                        <h1 style="font-size: 4rem; margin: 1rem 0;">{prediction:.1f} km/h</h1>
+                        <p style="font-size: 1.2rem;">Based on your input conditions</p>
                     </div>
                     """,
                         unsafe_allow_html=True,
                     )
 
-                with mini3:
-                    effort_score = (elevasi / 10) + (curah_hujan / 5) + max(0, 8 - jam_tidur) * 5
-                    if effort_score < 30:
-                        effort_level, effort_color = "😌 Easy", "#2ecc71"
-                    elif effort_score < 50:
-                        effort_level, effort_color = "💪 Moderate", "#f39c12"
-                    else:
-                        effort_level, effort_color = "🔥 Challenging", "#e74c3c"
-                    st.markdown(
-                        f"""
-                    <div style="background: {effort_color}; color: white; padding: 1rem; border-radius: 10px; text-align: center;">
-                        <h5>{effort_level}</h5>
-                        <p>Effort Level</p>
-                    </div>
-                    """,
-                        unsafe_allow_html=True,
-                    )
+                    # Mini cards (nested columns within the narrower right column)
+                    mini1, mini2, mini3 = st.columns(3)
+
+                    with mini1:
+                        if prediction < 16:
+                            speed_category, speed_color = "🌊 Leisurely", "#3498db"
+                        elif prediction < 20:
+                            speed_category, speed_color = "🚴‍♀️ Moderate", "#f39c12"
+                        elif prediction < 24:
+                            speed_category, speed_color = "🚴‍♂️ Fast", "#e67e22"
+                        else:
+                            speed_category, speed_color = "🏆 Very Fast", "#e74c3c"
+                        st.markdown(
+                            f"""
+                        <div style="background: {speed_color}; color: white; padding: 1rem; border-radius: 10px; text-align: center;">
+                            <h5>{speed_category}</h5>
+                            <p>Speed Category</p>
+                        </div>
+                        """,
+                            unsafe_allow_html=True,
+                        )
+
+                    with mini2:
+                        estimated_time = jarak / prediction * 60  # minutes
+                        hours = int(estimated_time // 60)
+                        minutes = int(estimated_time % 60)
+                        st.markdown(
+                            f"""
+                        <div style="background: #27ae60; color: white; padding: 1rem; border-radius: 10px; text-align: center;">
+                            <h5>⏱️ {hours:02d}:{minutes:02d}</h5>
+                            <p>Estimated Time</p>
+                        </div>
+                        """,
+                            unsafe_allow_html=True,
+                        )
+
+                    with mini3:
+                        effort_score = (elevasi / 10) + (curah_hujan / 5) + max(0, 8 - jam_tidur) * 5
+                        if effort_score < 30:
+                            effort_level, effort_color = "😌 Easy", "#2ecc71"
+                        elif effort_score < 50:
+                            effort_level, effort_color = "💪 Moderate", "#f39c12"
+                        else:
+                            effort_level, effort_color = "🔥 Challenging", "#e74c3c"
+                        st.markdown(
+                            f"""
+                        <div style="background: {effort_color}; color: white; padding: 1rem; border-radius: 10px; text-align: center;">
+                            <h5>{effort_level}</h5>
+                            <p>Effort Level</p>
+                        </div>
+                        """,
+                            unsafe_allow_html=True,
+                        )
         else:
             # Placeholder keeps right column balanced before prediction
             st.info("Klik **Predict Speed** untuk melihat hasil dan ringkasan di sini.")
@@ -375,39 +454,13 @@ def main():
 
         # Speed comparison chart
         st.subheader("📊 Speed Comparison")
-        perfect_speed = predict_cycling_speed_demo(100, jarak, 0, 8, time(6, 0))[0]
-        rainy_speed = predict_cycling_speed_demo(elevasi, jarak, 20, jam_tidur, jam_mulai)[0]
-        hilly_speed = predict_cycling_speed_demo(400, jarak, curah_hujan, jam_tidur, jam_mulai)[0]
-        tired_speed = predict_cycling_speed_demo(elevasi, jarak, curah_hujan, 3, jam_mulai)[0]
-
-        comparison_scenarios = [
-            ("Perfect Conditions", perfect_speed),
-            ("Your Prediction", prediction),
-            ("Rainy Conditions", rainy_speed),
-            ("Hilly Terrain", hilly_speed),
-            ("Tired Rider", tired_speed),
-        ]
-        scenario_names = [item[0] for item in comparison_scenarios]
-        scenario_speeds = [item[1] for item in comparison_scenarios]
-        fig_comparison = go.Figure(
-            data=[
-                go.Bar(
-                    x=scenario_names,
-                    y=scenario_speeds,
-                    marker_color=[
-                        '#2ecc71' if name == 'Perfect Conditions' else '#e74c3c' if name == 'Your Prediction' else '#95a5a6'
-                        for name in scenario_names
-                    ],
-                )
-            ]
-        )
-        fig_comparison.update_layout(
-            title="Speed Comparison Across Different Scenarios",
-            xaxis_title="Scenarios",
-            yaxis_title="Speed (km/h)",
-            height=400,
-        )
-        st.plotly_chart(fig_comparison, use_container_width=True)
+        scenario_results = predict_comparison(elevasi, jarak, curah_hujan, jam_tidur, jam_mulai, model_package)
+        # Keep the rider's own prediction right after the first (reference) scenario
+        comparison_scenarios = scenario_results[:1] + [("Your Prediction", prediction)] + scenario_results[1:]
+        with metrics.timer('figure_build'):
+            fig_comparison = comparison_figure(comparison_scenarios)
+        with metrics.timer('chart_render'):
+            st.plotly_chart(fig_comparison, use_container_width=True)
 
         # Recommendations
         st.subheader("💡 Recommendations")
@@ -429,6 +482,19 @@ def main():
         for rec in recommendations:
             st.info(rec)
 
+
+def main():
+    # Header
+    st.markdown('<h1 class="main-header">📊 Cycling Speed Predictor</h1>', unsafe_allow_html=True)
+    st.markdown("### 🔊 Prediksi Kecepatan Rata-rata Bersepeda Berdasarkan Kondisi Topografi & Cuaca")
+    st.info("🏠 Kembali ke **Home** atau kunjungi **👤 Profile** untuk informasi developer")
+
+    # Sidebar — Model information
+    with st.sidebar:
+        model_information()
+
+    prediction_section()
+
     # Footer
     st.markdown("---")
     st.markdown(
@@ -1,7 +1,8 @@
 import streamlit as st
-from PIL import Image
 import os
 
+from cycling_speed.assets import PROFILE_IMAGE, PROFILE_SIZE, asset_path, image_data_uri
+
 # Page config
 st.set_page_config(
     page_title="👤 Profil & Tugas Akhir", 
@@ -213,40 +214,14 @@ st.markdown("""
 
 def load_profile_image():
     """
-    Function to load profile image with multiple path attempts
-    Returns base64 encoded image for direct HTML embedding
+    Load the profile photo as a small square WebP data URI for direct HTML embedding
+    (resized once, then served from memory). Returns (data_uri, path) or (None, None)
     """
-    import base64
-    from io import BytesIO
-    
-    # Get the current working directory
-    current_dir = os.getcwd()
-    
-    # Define possible paths for the profile image
-    possible_paths = [
-        "assets/profile.jpg",
-        "./assets/profile.jpg",
-        os.path.join(current_dir, "assets", "profile.jpg"),
-        os.path.join(os.path.dirname(__file__), "assets", "profile.jpg") if '__file__' in globals() else None,
-        "profile.jpg",
-        "./profile.jpg"
-    ]
-    
-    # Remove None values
-    possible_paths = [path for path in possible_paths if path is not None]
-    
-    # Try to load image from each path
-    for path in possible_paths:
-        try:
-            if os.path.exists(path):
-                with open(path, "rb") as img_file:
-                    img_bytes = img_file.read()
-                    img_base64 = base64.b64encode(img_bytes).decode()
-                    return img_base64, path
-        except Exception as e:
-            continue
-    
-    return None, None
+    path = asset_path(PROFILE_IMAGE)
+    try:
+        return image_data_uri(path, PROFILE_SIZE, square=True), path
+    except (OSError, ValueError):
+        return None, None
 
 def main():
     # Header
@@ -259,9 +234,9 @@ def main():
     col1, col2, col3 = st.columns([1, 1, 1])
     with col2:
         # Try to load the profile image
-        img_base64, image_path = load_profile_image()
+        img_uri, image_path = load_profile_image()
         
-        if img_base64 is not None:
+        if img_uri is not None:
             # Display image using HTML div with circular frame
             st.markdown(f"""
             <div style="display: flex; justify-content: center; margin-bottom: 1.5rem;">
@@ -269,7 +244,7 @@ def main():
                     width: 180px; 
                     height: 180px; 
                     border-radius: 50%; 
-                    background-image: url(data:image/jpeg;base64,{img_base64});
+                    background-image: url({img_uri});
                     background-size: cover;
                     background-position: center;
                     background-repeat: no-repeat;
@@ -316,18 +291,10 @@ def main():
             with st.expander("🔍 Debug Info - Lokasi file yang dicari"):
                 current_dir = os.getcwd()
                 st.write(f"**Current working directory:** `{current_dir}`")
-                st.write("**Paths yang dicoba:**")
-                possible_paths = [
-                    "assets/profile.jpg",
-                    "./assets/profile.jpg",
-                    os.path.join(current_dir, "assets", "profile.jpg"),
-                    "profile.jpg",
-                    "./profile.jpg"
-                ]
-                
-                for path in possible_paths:
-                    exists = "✅" if os.path.exists(path) else "❌"
-                    st.write(f"- {exists} `{path}`")
+                st.write("**Path yang dicoba:**")
+                path = asset_path(PROFILE_IMAGE)
+                exists = "✅" if os.path.exists(path) else "❌"
+                st.write(f"- {exists} `{path}`")
                 
                 st.write("**Files in current directory:**")
                 try:
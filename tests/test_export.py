@@ -0,0 +1,70 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from cycling_speed.export import _raw_thresholds, export_native, fold_scaler_into_trees, load_package, max_prediction_diff
+from cycling_speed.inference import MODEL_PATH, unpack_model
+
+needs_model = pytest.mark.skipif(not os.path.exists(MODEL_PATH), reason=f"{MODEL_PATH} not found")
+
+
+def scaled_goes_left(x, threshold, mean, scale):
+    """The split test SpeedPredictor + booster apply to a raw value: float32((x - mean) / scale) < t."""
+    return ((np.asarray(x, dtype=np.float64) - mean) / scale).astype(np.float32) < np.float32(threshold)
+
+
+@pytest.fixture(scope='module')
+def package():
+    pytest.importorskip('xgboost')
+    return load_package(MODEL_PATH)
+
+
+@needs_model
+def test_folded_ubj_matches_exactly(package, tmp_path):
+    path = export_native(package, str(tmp_path / 'folded.ubj'), fold_scaler=True)
+    assert max_prediction_diff(package, load_package(path)) == 0.0
+
+
+@needs_model
+@pytest.mark.parametrize('fold_scaler', [False, True])
+def test_npz_within_tolerance(package, tmp_path, fold_scaler):
+    path = export_native(package, str(tmp_path / 'trees.npz'), fold_scaler=fold_scaler)
+    assert max_prediction_diff(package, load_package(path)) < 1e-4
+
+
+def test_raw_thresholds_on_integer_boundaries():
+    # Thresholds that scaled integers hit exactly, as for hours and sleep
+    rng = np.random.default_rng(0)
+    n = 5000
+    mean = rng.uniform(-20, 20, n)
+    scale = rng.uniform(0.1, 10, n)
+    x = rng.integers(-50, 50, n).astype(np.float64)
+    threshold = ((x - mean) / scale).astype(np.float32)
+    raw = _raw_thresholds(threshold, mean, scale)
+
+    assert not scaled_goes_left(raw, threshold, mean, scale).any()
+    assert scaled_goes_left(np.nextafter(raw, np.float32(-np.inf)), threshold, mean, scale).all()
+    # The integer itself is not below the scaled cut, so it must not be below the raw one either
+    assert not (x.astype(np.float32) < raw).any()
+
+
+@needs_model
+def test_folded_splits_agree_at_boundaries(package):
+    """Raw values exactly on, and one float32 step below, each folded threshold take the same branch."""
+    booster, _, mean, scale = unpack_model(package)
+    model_json = json.loads(booster.save_raw('json'))
+    trees = model_json['learner']['gradient_booster']['model']['trees']
+    scaled = [(tree['split_indices'][i], tree['split_conditions'][i])
+              for tree in trees for i, left in enumerate(tree['left_children']) if left != -1]
+    fold_scaler_into_trees(model_json, mean, scale)
+    folded = [tree['split_conditions'][i]
+              for tree in model_json['learner']['gradient_booster']['model']['trees']
+              for i, left in enumerate(tree['left_children']) if left != -1]
+
+    for (feature, threshold), raw in zip(scaled, folded):
+        raw = np.float32(raw)
+        below = np.nextafter(raw, np.float32(-np.inf))
+        for x in (raw, below):
+            assert (x < raw) == scaled_goes_left(x, threshold, mean[feature], scale[feature])
@@ -0,0 +1,55 @@
+import math
+from http import HTTPStatus
+
+import pytest
+
+from cycling_speed.service import HTTPError, content_length, parse_ride
+
+RIDE = {'elevasi': 200, 'jarak': 25, 'curah_hujan': 0, 'jam_tidur': 7, 'jam_mulai': '06:30', 'day_of_week': 5}
+
+
+def test_parse_ride():
+    assert parse_ride(RIDE) == [200.0, 25.0, 0.0, 7.0, 6.0, 5.0]
+    assert parse_ride(dict(RIDE, hour=23))[4] == 23.0
+    assert parse_ride(dict(RIDE, jam_mulai='23:59:59'))[4] == 23.0
+
+
+@pytest.mark.parametrize('change', [
+    {'hour': 25},
+    {'hour': -1},
+    {'hour': math.nan},
+    {'jam_mulai': '25:00'},
+    {'jam_mulai': '06:60'},
+    {'jam_mulai': '6'},
+    {'jam_mulai': 'noon'},
+    {'jarak': -3},
+    {'jarak': math.inf},
+    {'elevasi': math.nan},
+    {'elevasi': '200'},
+    {'curah_hujan': 101},
+    {'jam_tidur': 0},
+    {'jam_tidur': True},
+    {'day_of_week': 7},
+    {'day_of_week': 2.5},
+])
+def test_parse_ride_rejects_out_of_range(change):
+    with pytest.raises(ValueError):
+        parse_ride(dict(RIDE, **change))
+
+
+def test_parse_ride_missing_fields():
+    with pytest.raises(ValueError, match='jarak'):
+        parse_ride({k: v for k, v in RIDE.items() if k != 'jarak'})
+
+
+@pytest.mark.parametrize('value, expected', [(None, 0), ('', 0), ('0', 0), ('42', 42)])
+def test_content_length(value, expected):
+    headers = {} if value is None else {'content-length': value}
+    assert content_length(headers) == expected
+
+
+@pytest.mark.parametrize('value', ['abc', '-5', '+5', '4 2', '1.5', '\xb2'])
+def test_content_length_rejects_invalid(value):
+    with pytest.raises(HTTPError) as excinfo:
+        content_length({'content-length': value})
+    assert excinfo.value.status == HTTPStatus.BAD_REQUEST
@@ -0,0 +1,81 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from cycling_speed.inference import MODEL_PATH
+
+pytest.importorskip('xgboost')
+pytestmark = pytest.mark.skipif(not os.path.exists(MODEL_PATH), reason=f"{MODEL_PATH} not found")
+
+TOLERANCE = 1e-4
+
+
+@pytest.fixture(scope='module')
+def booster():
+    from cycling_speed.export import load_package
+    from cycling_speed.inference import unpack_model
+
+    return unpack_model(load_package(MODEL_PATH))[0]
+
+
+@pytest.fixture(scope='module')
+def ensemble(booster):
+    from cycling_speed.trees import TreeEnsemble
+
+    return TreeEnsemble.from_booster(booster)
+
+
+def split_thresholds(booster):
+    """(feature, threshold) of every split node in the booster."""
+    trees = json.loads(booster.save_raw('json'))['learner']['gradient_booster']['model']['trees']
+    return sorted({(feature, threshold)
+                   for tree in trees
+                   for feature, threshold, left in zip(tree['split_indices'], tree['split_conditions'],
+                                                       tree['left_children'])
+                   if left != -1})
+
+
+def assert_parity(ensemble, booster, X):
+    diff = np.abs(ensemble.predict(X) - booster.inplace_predict(X))
+    assert diff.max() < TOLERANCE
+
+
+def test_random_rows(ensemble, booster):
+    rng = np.random.default_rng(0)
+    X = rng.normal(0, 1.5, size=(5000, booster.num_features())).astype(np.float32)
+    assert_parity(ensemble, booster, X)
+
+
+def test_missing_values(ensemble, booster):
+    rng = np.random.default_rng(1)
+    X = rng.normal(0, 1.5, size=(2000, booster.num_features())).astype(np.float32)
+    X[rng.random(X.shape) < 0.2] = np.nan
+    X[:10] = np.nan
+    assert_parity(ensemble, booster, X)
+
+
+def test_rows_on_split_thresholds(ensemble, booster):
+    thresholds = split_thresholds(booster)
+    assert thresholds
+    rng = np.random.default_rng(2)
+    X = rng.normal(0, 1.5, size=(len(thresholds), booster.num_features())).astype(np.float32)
+    # Other features often sit on a threshold too
+    for feature, threshold in thresholds:
+        X[:, feature] = np.where(rng.random(len(X)) < 0.3, np.float32(threshold), X[:, feature])
+    # Row i lies exactly on split i; the copy below lies just left of it
+    for row, (feature, threshold) in enumerate(thresholds):
+        X[row, feature] = threshold
+    below = np.nextafter(X, np.float32(-np.inf))
+    assert_parity(ensemble, booster, np.vstack([X, below]))
+
+
+def test_mmap_round_trip(ensemble, booster, tmp_path):
+    from cycling_speed.trees import TreeEnsemble
+
+    path = tmp_path / 'trees.npz'
+    ensemble.save(path)
+    loaded = TreeEnsemble.load(str(path), mmap_mode='r')
+    X = np.random.default_rng(3).normal(0, 1.5, size=(500, booster.num_features())).astype(np.float32)
+    assert_parity(loaded, booster, X)